@@ -24,6 +24,7 @@ import base64
 import concurrent.futures
 import contextlib
 import fcntl
+import functools
 import hashlib
 import ipaddress
 import json
@@ -40,13 +41,23 @@ import sys
 import tempfile
 import threading
 import time
-from copy import deepcopy
 from dataclasses import dataclass
 from pathlib import Path
+from xml.etree import ElementTree
 from itertools import combinations
 
 import node_setup
 
+try:
+    from cryptography.hazmat.primitives import serialization
+except ImportError:  # optional; _rsa_private_components() parses DER itself
+    serialization = None
+
+try:
+    import libvirt
+except ImportError:  # optional; libvirt_bridge_ifaces() falls back to virsh
+    libvirt = None
+
 
 TOPOLOGY_PROBE_TIMEOUT_SECONDS = 5.0
 
@@ -67,6 +78,19 @@ def find_global(zones: list) -> dict:
     return {}
 
 
+def split_zones(config: dict) -> tuple[dict, list]:
+    """Return (GLOBAL section, member zones) from one pass over config["zones"]."""
+    global_cfg: dict = {}
+    zones = []
+    for z in config["zones"]:
+        if z.get("id") == "GLOBAL":
+            if not global_cfg:
+                global_cfg = z
+        else:
+            zones.append(z)
+    return global_cfg, zones
+
+
 def find_zone(zones: list, zone_id) -> dict:
     for z in zones:
         if z.get("id") == zone_id:
@@ -76,33 +100,44 @@ def find_zone(zones: list, zone_id) -> dict:
 
 def merge_section(base: dict, override: dict) -> dict:
     """Shallow merge: override keys replace base keys within a section."""
-    result = deepcopy(base)
-    result.update(override)
-    return result
+    return {**base, **override}
+
+
+# Zone keys that describe the zone itself rather than override config.
+ZONE_META_KEYS = frozenset(("id", "name", "nodes", "nodes_config"))
 
 
 def resolve_config(global_cfg: dict, zone_cfg: dict, node_cfg: dict = None) -> dict:
-    """Cascade: GLOBAL -> ZONE -> NODE. Each section merges independently."""
-    result = deepcopy(global_cfg)
+    """Cascade: GLOBAL -> ZONE -> NODE. Each section merges independently.
+
+    The returned dict and its merged sections are fresh, but leaf values are
+    shared with the loaded config; callers may replace keys but must not
+    mutate nested values in place.
+    """
+    result = dict(global_cfg)
+
+    # Most zones only carry id/name/nodes; nothing to merge for them.
+    if not node_cfg and ZONE_META_KEYS.issuperset(zone_cfg):
+        return result
 
     # Merge zone-level overrides
-    for key in zone_cfg:
-        if key in ("id", "name", "nodes", "nodes_config"):
+    for key, value in zone_cfg.items():
+        if key in ZONE_META_KEYS:
             continue
-        if isinstance(zone_cfg[key], dict) and isinstance(result.get(key), dict):
-            result[key] = merge_section(result[key], zone_cfg[key])
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = {**result[key], **value}
         else:
-            result[key] = deepcopy(zone_cfg[key])
+            result[key] = value
 
     # Merge node-level overrides
     if node_cfg:
-        for key in node_cfg:
+        for key, value in node_cfg.items():
             if key in ("id", "name"):
                 continue
-            if isinstance(node_cfg[key], dict) and isinstance(result.get(key), dict):
-                result[key] = merge_section(result[key], node_cfg[key])
+            if isinstance(value, dict) and isinstance(result.get(key), dict):
+                result[key] = {**result[key], **value}
             else:
-                result[key] = deepcopy(node_cfg[key])
+                result[key] = value
 
     return result
 
@@ -115,6 +150,14 @@ def get_node_config(zone_cfg: dict, node_id: int) -> dict:
     return {}
 
 
+def node_configs_by_id(zone_cfg: dict) -> dict:
+    """Index a zone's nodes_config by id; the first entry wins, as in get_node_config()."""
+    by_id = {}
+    for nc in zone_cfg.get("nodes_config", []):
+        by_id.setdefault(nc.get("id"), nc)
+    return by_id
+
+
 # ---------------------------------------------------------------------------
 # Naming conventions - deterministic from config, no state file
 # ---------------------------------------------------------------------------
@@ -148,29 +191,63 @@ def mac_addr(zone_id: int, node_id: int, seq: int = 0) -> str:
 # ---------------------------------------------------------------------------
 
 
-def ivshmem_links(zone_cfg: dict, num_nodes: int) -> list:
-    """Return list of (nodeA, nodeB) pairs based on topology."""
+@functools.lru_cache(maxsize=None)
+def _ivshmem_pairs(topology: str, num_nodes: int, explicit: tuple) -> tuple:
+    """Normalised (low, high) node pairs for a topology; cached per zone shape."""
+    if topology == "ring":
+        pairs = ((i, (i + 1) % num_nodes) for i in range(num_nodes))
+    elif topology == "star":
+        return tuple((0, i) for i in range(1, num_nodes))
+    elif topology == "pairs":
+        pairs = explicit
+    else:
+        return tuple(combinations(range(num_nodes), 2))
+    return tuple((a, b) if a < b else (b, a) for a, b in pairs)
+
+
+@functools.lru_cache(maxsize=None)
+def _ivshmem_pairs_by_node(topology: str, num_nodes: int, explicit: tuple) -> dict:
+    """Index _ivshmem_pairs() by member node so per-node lookups are O(degree)."""
+    by_node: dict[int, list] = {}
+    for pair in _ivshmem_pairs(topology, num_nodes, explicit):
+        node_a, node_b = pair
+        by_node.setdefault(node_a, []).append(pair)
+        if node_b != node_a:
+            by_node.setdefault(node_b, []).append(pair)
+    return by_node
+
+
+def _ivshmem_shape(zone_cfg: dict) -> tuple | None:
+    """Return the hashable (topology, explicit links) key, or None if disabled."""
     ivshmem = zone_cfg.get("ivshmem", {})
     if not ivshmem.get("enabled", False):
-        return []
+        return None
 
     topology = ivshmem.get("topology", "full-mesh")
-
-    if topology == "full-mesh":
-        return list(combinations(range(num_nodes), 2))
-    elif topology == "ring":
-        pairs = [(i, (i + 1) % num_nodes) for i in range(num_nodes)]
-        return [(min(a, b), max(a, b)) for a, b in pairs]
-    elif topology == "star":
-        return [(0, i) for i in range(1, num_nodes)]
-    elif topology == "pairs":
-        explicit = ivshmem.get("ivshmem_links", [])
-        return [(min(a, b), max(a, b)) for a, b in explicit]
-    else:
+    if topology not in ("full-mesh", "ring", "star", "pairs"):
         print(
             f"WARNING: Unknown ivshmem topology '{topology}', defaulting to full-mesh"
         )
-        return list(combinations(range(num_nodes), 2))
+    explicit = tuple(tuple(link) for link in ivshmem.get("ivshmem_links", []))
+    return topology, explicit
+
+
+def ivshmem_links(zone_cfg: dict, num_nodes: int) -> list:
+    """Return list of (nodeA, nodeB) pairs based on topology."""
+    shape = _ivshmem_shape(zone_cfg)
+    if shape is None:
+        return []
+    topology, explicit = shape
+    return list(_ivshmem_pairs(topology, num_nodes, explicit))
+
+
+def ivshmem_links_for_node(zone_cfg: dict, num_nodes: int, node_id: int) -> list:
+    """Return the ivshmem_links() pairs that include *node_id*, in link order."""
+    shape = _ivshmem_shape(zone_cfg)
+    if shape is None:
+        return []
+    topology, explicit = shape
+    return list(_ivshmem_pairs_by_node(topology, num_nodes, explicit).get(node_id, ()))
 
 
 # ---------------------------------------------------------------------------
@@ -178,34 +255,97 @@ def ivshmem_links(zone_cfg: dict, num_nodes: int) -> list:
 # ---------------------------------------------------------------------------
 
 
-def run(cmd: str, check=True, quiet=False, privileged=False):
-    """Run a shell command, optionally with sudo, optionally ignoring errors."""
-    if privileged:
-        cmd = f"sudo {cmd}"
-    if not quiet:
-        print(f"  $ {cmd}")
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-    if check and result.returncode != 0:
-        print(f"    FAILED: {result.stderr.strip()}")
-        return False
-    return True
+def sudo_prefix() -> list[str]:
+    """argv prefix for privileged commands; empty when already root."""
+    return [] if os.geteuid() == 0 else ["sudo"]
+
+
+class CommandBatcher:
+    """Accumulate privileged shell lines and run them in one ``sudo sh -s``.
+
+    Lines execute sequentially in a single shell, in the order they were
+    added, so later lines can rely on earlier ones.  Checked lines
+    report failures on stderr and in ``failed``; ``fatal`` lines abort the
+    rest of the script.
+    """
+
+    def __init__(self, log=print):
+        self.commands: list[str] = []
+        self.failed: list[str] = []
+        self.log = log
+
+    def add(self, cmd: str, check=True, quiet=False, fatal=False):
+        if not quiet:
+            self.log(f"  $ sudo {cmd}")
+        failed = f"printf '    FAILED: %s\\n' {shlex.quote(cmd)} >&2"
+        if fatal:
+            self.commands.append(f"{cmd} || {{ {failed}; exit 1; }}")
+        elif check:
+            self.commands.append(f"{cmd} || {failed}")
+        else:
+            self.commands.append(f"{{ {cmd}; }} >/dev/null 2>&1 || true")
+
+    def flush(self) -> bool:
+        """Run all queued lines; return False if a fatal line failed."""
+        if not self.commands:
+            return True
+        script = "\n".join(self.commands) + "\n"
+        self.commands = []
+        self.failed = []
+        result = subprocess.run(
+            [*sudo_prefix(), "sh", "-s"],
+            input=script,
+            capture_output=True,
+            text=True,
+        )
+        for line in result.stderr.splitlines():
+            if line.startswith("    FAILED: "):
+                self.failed.append(line[len("    FAILED: ") :])
+                self.log(line)
+            elif line.strip():
+                self.log(f"    {line}")
+        return result.returncode == 0
 
 
 def ensure_sudo():
     """Validate/cache sudo credentials so the user is prompted once upfront."""
+    if os.geteuid() == 0:
+        return
     result = subprocess.run(["sudo", "-v"], capture_output=False)
     if result.returncode != 0:
         print("ERROR: Failed to obtain sudo privileges.", file=sys.stderr)
         sys.exit(1)
 
 
-def link_exists(name: str) -> bool:
-    return (
-        subprocess.run(
-            f"ip link show {name}", shell=True, capture_output=True
-        ).returncode
-        == 0
-    )
+def kernel_module_present(name: str) -> bool:
+    """True if *name* is loaded or built in (both appear under /sys/module)."""
+    return os.path.isdir(f"/sys/module/{name}")
+
+
+def read_sysctl(key: str) -> str | None:
+    """Read a sysctl value from /proc/sys without forking; None if absent."""
+    try:
+        with open("/proc/sys/" + key.replace(".", "/")) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def link_snapshot() -> dict[str, dict]:
+    """Return ``ip -j link show`` output keyed by link name (one probe)."""
+    result = run_topology_probe(["ip", "-j", "link", "show"])
+    if result.returncode != 0:
+        return {}
+    try:
+        links = json.loads(result.stdout)
+    except json.JSONDecodeError:
+        return {}
+    return {link["ifname"]: link for link in links if "ifname" in link}
+
+
+def link_inventory() -> set[str]:
+    """Return the names of all host links from a single ``ip -j link show``."""
+    return set(link_snapshot())
 
 
 def ensure_vhost_net_available():
@@ -221,6 +361,7 @@ def ensure_vhost_net_available():
         )
 
 
+@functools.lru_cache(maxsize=None)
 def parse_size(s: str) -> int:
     """Parse size string like '16M' to bytes."""
     s = s.strip().upper()
@@ -233,6 +374,16 @@ def parse_size(s: str) -> int:
     return int(s)
 
 
+def create_ivshmem_file(fpath: str, size_bytes: int):
+    """Create a sparse, world-writable ivshmem backing file of *size_bytes*."""
+    fd = os.open(fpath, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o666)
+    try:
+        os.ftruncate(fd, size_bytes)
+        os.fchmod(fd, 0o666)
+    finally:
+        os.close(fd)
+
+
 def run_topology_probe(args: list[str]) -> subprocess.CompletedProcess[str]:
     """Run a host topology inspection command with a short anti-hang timeout."""
     try:
@@ -251,10 +402,35 @@ def run_topology_probe(args: list[str]) -> subprocess.CompletedProcess[str]:
         )
 
 
-def tap_owner_uid(name: str) -> int | None:
+IFF_MULTI_QUEUE = 0x0100
+
+
+def _read_tun_attr(name: str, attr: str) -> str | None:
+    """Read a tun driver sysfs attribute (owner, tun_flags) without forking."""
+    try:
+        with open(f"/sys/class/net/{name}/{attr}") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _tuntap_show(name: str) -> subprocess.CompletedProcess[str]:
     result = run_topology_probe(["sudo", "-n", "ip", "tuntap", "show", "dev", name])
     if result.returncode != 0:
         result = run_topology_probe(["ip", "tuntap", "show", "dev", name])
+    return result
+
+
+def tap_owner_uid(name: str) -> int | None:
+    owner = _read_tun_attr(name, "owner")
+    if owner is not None:
+        try:
+            uid = int(owner)
+        except ValueError:
+            uid = -1
+        return uid if uid >= 0 else None
+
+    result = _tuntap_show(name)
     if result.returncode != 0:
         return None
 
@@ -270,9 +446,13 @@ def tap_owner_uid(name: str) -> int | None:
 
 def tap_has_multiqueue(name: str) -> bool:
     """Return True if the TAP device was created with IFF_MULTI_QUEUE."""
-    result = run_topology_probe(["sudo", "-n", "ip", "tuntap", "show", "dev", name])
-    if result.returncode != 0:
-        result = run_topology_probe(["ip", "tuntap", "show", "dev", name])
+    flags = _read_tun_attr(name, "tun_flags")
+    if flags is not None:
+        try:
+            return bool(int(flags, 16) & IFF_MULTI_QUEUE)
+        except ValueError:
+            pass
+    result = _tuntap_show(name)
     return result.returncode == 0 and "multi_queue" in result.stdout
 
 
@@ -290,20 +470,20 @@ def bridge_ip_interface(ip_cfg):
         ) from exc
 
 
-def bridge_addr_info(bridge: str) -> list[dict]:
+def bridge_addr_info(bridge: str, log=print) -> list[dict]:
     result = subprocess.run(
         ["ip", "-j", "addr", "show", "dev", bridge],
         capture_output=True,
         text=True,
     )
     if result.returncode != 0:
-        print(f"  WARNING: failed to read addresses for bridge {bridge}")
+        log(f"  WARNING: failed to read addresses for bridge {bridge}")
         return []
 
     try:
         links = json.loads(result.stdout)
     except json.JSONDecodeError:
-        print(f"  WARNING: failed to parse addresses for bridge {bridge}")
+        log(f"  WARNING: failed to parse addresses for bridge {bridge}")
         return []
 
     if not links:
@@ -311,14 +491,14 @@ def bridge_addr_info(bridge: str) -> list[dict]:
     return links[0].get("addr_info", [])
 
 
-def configure_bridge_ip(bridge: str, ip_cfg):
+def configure_bridge_ip(bridge: str, ip_cfg, log=print):
     desired = bridge_ip_interface(ip_cfg)
     desired_local = str(desired.ip)
     desired_cidr = str(desired)
     desired_family = "inet6" if desired.version == 6 else "inet"
     current_cidrs = []
 
-    for info in bridge_addr_info(bridge):
+    for info in bridge_addr_info(bridge, log=log):
         if info.get("family") != desired_family:
             continue
         local = info.get("local")
@@ -329,23 +509,27 @@ def configure_bridge_ip(bridge: str, ip_cfg):
         if local == desired_local:
             current_cidrs.append(current_cidr)
 
+    batch = CommandBatcher(log=log)
+    removed = []
     for current_cidr in current_cidrs:
         if current_cidr == desired_cidr:
             continue
-        run(
+        batch.add(
             f"ip addr del {shlex.quote(current_cidr)} dev {shlex.quote(bridge)}",
             check=False,
-            privileged=True,
         )
-        print(f"  Removed stale bridge IP: {current_cidr}")
+        removed.append(current_cidr)
 
     if desired_cidr not in current_cidrs:
-        run(
+        batch.add(
             f"ip addr add {shlex.quote(desired_cidr)} dev {shlex.quote(bridge)}",
             check=False,
-            privileged=True,
         )
-    print(f"  Bridge IP: {desired_cidr}")
+    if batch.commands:
+        batch.flush()
+    for current_cidr in removed:
+        log(f"  Removed stale bridge IP: {current_cidr}")
+    log(f"  Bridge IP: {desired_cidr}")
 
 
 def bridge_dns_servers(dns_cfg) -> list[str]:
@@ -378,89 +562,124 @@ def bridge_dns_servers(dns_cfg) -> list[str]:
     return servers
 
 
-def configure_bridge_dns(bridge: str, dns_cfg):
+def configure_bridge_dns(bridge: str, dns_cfg, log=print):
     """Apply host-only .wos DNS settings for a bridge via systemd-resolved."""
     dns_servers = bridge_dns_servers(dns_cfg)
     if not dns_servers:
         return
 
     if shutil.which("resolvectl") is None:
-        print(
+        log(
             f"  WARNING: bridge DNS configured for {bridge}, but resolvectl was not found"
         )
         return
 
     bridge_arg = shlex.quote(bridge)
     dns_args = " ".join(shlex.quote(server) for server in dns_servers)
-    ok = run(f"resolvectl dns {bridge_arg} {dns_args}", privileged=True)
-    ok = run(f"resolvectl domain {bridge_arg} '~wos'", privileged=True) and ok
-    ok = run(f"resolvectl default-route {bridge_arg} false", privileged=True) and ok
-    if ok:
-        print(f"  Bridge DNS: {', '.join(dns_servers)} (.wos only)")
+    batch = CommandBatcher(log=log)
+    # Checked, not fatal: every setting is attempted and any failure reported.
+    batch.add(f"resolvectl dns {bridge_arg} {dns_args}")
+    batch.add(f"resolvectl domain {bridge_arg} '~wos'")
+    batch.add(f"resolvectl default-route {bridge_arg} false")
+    if batch.flush() and not batch.failed:
+        log(f"  Bridge DNS: {', '.join(dns_servers)} (.wos only)")
         return
 
-    print(f"  WARNING: failed to configure bridge DNS for {bridge}")
+    log(f"  WARNING: failed to configure bridge DNS for {bridge}")
 
 
-def revert_bridge_dns(bridge: str):
-    if shutil.which("resolvectl") is not None:
-        run(
-            f"resolvectl revert {shlex.quote(bridge)}",
-            check=False,
-            quiet=True,
-            privileged=True,
-        )
+def _domain_bridge_ifaces(vm: str, xml_desc: str) -> list[tuple[str, str, str]]:
+    """Return (vm, bridge, tap) for each bridged interface in a domain XML."""
+    try:
+        root = ElementTree.fromstring(xml_desc)
+    except ElementTree.ParseError:
+        return []
+    found = []
+    for iface in root.iterfind("./devices/interface"):
+        source = iface.find("source")
+        target = iface.find("target")
+        if source is None or target is None:
+            continue
+        bridge = source.get("bridge")
+        dev = target.get("dev")
+        if bridge and dev:
+            found.append((vm, bridge, dev))
+    return found
+
 
+def libvirt_bridge_ifaces() -> dict[str, list[tuple[str, str]]]:
+    """Map bridge name -> [(vm, tap)] for every running libvirt VM.
 
-def reattach_libvirt_vms(bridge: str):
-    """Re-attach any running libvirt VM interfaces that target *bridge*.
+    Uses the libvirt bindings (one read-only connection) when installed and
+    falls back to ``virsh list`` plus one ``virsh dumpxml`` per VM.  Returns
+    an empty map when libvirt is unavailable.
+    """
+    entries: list[tuple[str, str, str]] = []
+    if libvirt is not None:
+        libvirt.registerErrorHandler(lambda _ctx, _err: None, None)
+        try:
+            conn = libvirt.openReadOnly("qemu:///system")
+        except libvirt.libvirtError:
+            return {}
+        try:
+            for dom in conn.listAllDomains(libvirt.VIR_CONNECT_LIST_DOMAINS_ACTIVE):
+                entries.extend(_domain_bridge_ifaces(dom.name(), dom.XMLDesc(0)))
+        except libvirt.libvirtError:
+            return {}
+        finally:
+            conn.close()
+    else:
+        if shutil.which("virsh") is None:
+            return {}
+        result = run_topology_probe(["virsh", "-c", "qemu:///system", "list", "--name"])
+        if result.returncode != 0:
+            return {}  # libvirt not available - nothing to do
+        vms = [name.strip() for name in result.stdout.splitlines() if name.strip()]
+        for vm in vms:
+            result = run_topology_probe(["virsh", "-c", "qemu:///system", "dumpxml", vm])
+            if result.returncode == 0:
+                entries.extend(_domain_bridge_ifaces(vm, result.stdout))
+
+    by_bridge: dict[str, list[tuple[str, str]]] = {}
+    for vm, bridge, dev in entries:
+        by_bridge.setdefault(bridge, []).append((vm, dev))
+    return by_bridge
+
+
+def reattach_libvirt_vms(
+    bridge: str,
+    vm_ifaces: list[tuple[str, str]],
+    existing_links: set[str],
+    log=print,
+):
+    """Re-attach running libvirt VM interfaces that target *bridge*.
 
     When the cluster setup script (re)creates a bridge, any libvirt TAP
-    interfaces previously enslaved to it lose their master.  This queries
-    ``virsh`` for every running VM and re-attaches interfaces whose
-    configured source bridge matches *bridge*.
+    interfaces previously enslaved to it lose their master.  *vm_ifaces* is
+    this bridge's entry from ``libvirt_bridge_ifaces()`` and *existing_links*
+    is the caller's host link snapshot from ``link_inventory()``.
     """
-    # List running VMs via the system connection
-    result = subprocess.run(
-        "virsh -c qemu:///system list --name 2>/dev/null",
-        shell=True,
-        capture_output=True,
-        text=True,
-    )
-    if result.returncode != 0:
-        return  # libvirt not available - nothing to do
+    candidates = [(vm, iface) for vm, iface in vm_ifaces if iface in existing_links]
+    if not candidates:
+        return
 
-    vms = [name.strip() for name in result.stdout.splitlines() if name.strip()]
-    for vm in vms:
-        result = subprocess.run(
-            f"virsh -c qemu:///system domiflist {vm} 2>/dev/null",
-            shell=True,
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode != 0:
+    # One link probe gives every candidate's current master.
+    links = link_snapshot()
+    batch = CommandBatcher(log=log)
+    reattached = []
+    for vm, iface in candidates:
+        link = links.get(iface)
+        if link is not None and link_master(link) == bridge:
             continue
-        for line in result.stdout.splitlines():
-            cols = line.split()
-            # columns: Interface  Type  Source  Model  MAC
-            if len(cols) >= 3 and cols[2] == bridge:
-                iface = cols[0]
-                if iface == "Interface" or iface.startswith("-"):
-                    continue
-                if not link_exists(iface):
-                    continue
-                # Check if already attached to the correct bridge
-                check = subprocess.run(
-                    f"ip -o link show {iface}",
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                )
-                if f"master {bridge}" in check.stdout:
-                    continue
-                run(f"ip link set {iface} master {bridge}", privileged=True)
-                run(f"ip link set {iface} up", privileged=True)
-                print(f"  Re-attached libvirt VM '{vm}' interface {iface} -> {bridge}")
+        batch.add(f"ip link set {iface} master {bridge}")
+        batch.add(f"ip link set {iface} up")
+        reattached.append((vm, iface))
+
+    if not reattached:
+        return
+    batch.flush()
+    for vm, iface in reattached:
+        log(f"  Re-attached libvirt VM '{vm}' interface {iface} -> {bridge}")
 
 
 # ---------------------------------------------------------------------------
@@ -471,25 +690,22 @@ CLUSTER_DATA_DIR = "cluster-data"
 SSH_KEYS_DIR = os.path.join(CLUSTER_DATA_DIR, "ssh-keys")
 
 
-def _parse_der_length(data: bytes, offset: int) -> tuple:
+def _parse_der_length(data: memoryview, offset: int) -> tuple:
     """Parse a DER length field. Returns (length, new_offset)."""
     b = data[offset]
-    offset += 1
     if b < 0x80:
-        return b, offset
-    num_bytes = b & 0x7F
-    length = int.from_bytes(data[offset : offset + num_bytes], "big")
-    return length, offset + num_bytes
+        return b, offset + 1
+    end = offset + 1 + (b & 0x7F)
+    return int.from_bytes(data[offset + 1 : end], "big"), end
 
 
-def _parse_der_integer(data: bytes, offset: int) -> tuple:
+def _parse_der_integer(data: memoryview, offset: int) -> tuple:
     """Parse a DER-encoded INTEGER. Returns (value, new_offset)."""
     if data[offset] != 0x02:
         raise ValueError(f"Expected INTEGER tag 0x02, got 0x{data[offset]:02x}")
-    offset += 1
-    length, offset = _parse_der_length(data, offset)
-    value = int.from_bytes(data[offset : offset + length], "big")
-    return value, offset + length
+    length, offset = _parse_der_length(data, offset + 1)
+    end = offset + length
+    return int.from_bytes(data[offset:end], "big"), end
 
 
 def _mpint_to_bytes(n: int) -> bytes:
@@ -508,18 +724,18 @@ def _ssh_string(data: bytes) -> bytes:
     return struct.pack(">I", len(data)) + data
 
 
-def _convert_pem_to_dropbear(pem_path: str, dropbear_path: str):
-    """Convert a PKCS#1 PEM RSA private key to dropbear's native format.
+def _rsa_private_components(pem: bytes) -> tuple:
+    """Return (n, e, d, p, q) from a PKCS#1 PEM RSA private key."""
+    if serialization is not None:
+        key = serialization.load_pem_private_key(pem, password=None)
+        nums = key.private_numbers()
+        pub = nums.public_numbers
+        return pub.n, pub.e, nums.d, nums.p, nums.q
 
-    Parses the DER-encoded RSA key components (n, e, d, p, q) and writes
-    them in the binary format that dropbear's buf_get_priv_key() expects:
-        string "ssh-rsa" | mpint e | mpint n | mpint d | mpint p | mpint q
-    """
-    with open(pem_path) as f:
-        pem = f.read()
-    lines = pem.strip().split("\n")
+    lines = pem.decode("ascii").strip().split("\n")
     der_b64 = "".join(l for l in lines if not l.startswith("-----"))
-    der = base64.b64decode(der_b64)
+    # memoryview keeps the per-field slices below copy-free.
+    der = memoryview(base64.b64decode(der_b64))
 
     # Parse PKCS#1 RSAPrivateKey SEQUENCE
     offset = 0
@@ -535,6 +751,19 @@ def _convert_pem_to_dropbear(pem_path: str, dropbear_path: str):
     p, offset = _parse_der_integer(der, offset)
     q, offset = _parse_der_integer(der, offset)
     # dp, dq, qinv not needed for dropbear format
+    return n, e, d, p, q
+
+
+def _convert_pem_to_dropbear(pem_path: str, dropbear_path: str):
+    """Convert a PKCS#1 PEM RSA private key to dropbear's native format.
+
+    Extracts the RSA key components (n, e, d, p, q) and writes
+    them in the binary format that dropbear's buf_get_priv_key() expects:
+        string "ssh-rsa" | mpint e | mpint n | mpint d | mpint p | mpint q
+    """
+    with open(pem_path, "rb") as f:
+        pem = f.read()
+    n, e, d, p, q = _rsa_private_components(pem)
 
     # Build dropbear RSA private key blob
     buf = b""
@@ -552,16 +781,54 @@ def _convert_pem_to_dropbear(pem_path: str, dropbear_path: str):
         os.close(fd)
 
 
+def _generate_host_key(node_id: int, key_dir: str, has_dropbearconvert: bool) -> str:
+    """Create one node's dropbear host key and return its progress line."""
+    dropbear_key = os.path.join(key_dir, "dropbear_rsa_host_key")
+
+    # Generate OpenSSH RSA key pair (PEM / PKCS#1 format)
+    openssh_key = os.path.join(key_dir, "ssh_host_rsa_key")
+    subprocess.run(
+        [
+            "ssh-keygen",
+            "-t",
+            "rsa",
+            "-b",
+            "2048",
+            "-f",
+            openssh_key,
+            "-N",
+            "",
+            "-m",
+            "PEM",
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+    if has_dropbearconvert:
+        subprocess.run(
+            ["dropbearconvert", "openssh", "dropbear", openssh_key, dropbear_key],
+            check=True,
+            capture_output=True,
+        )
+        return f"  [VM{node_id}] Generated SSH host key (ssh-keygen + dropbearconvert)"
+    _convert_pem_to_dropbear(openssh_key, dropbear_key)
+    return f"  [VM{node_id}] Generated SSH host key (ssh-keygen + PEM->dropbear)"
+
+
 def ensure_ssh_host_keys(node_ids: list):
     """Generate persistent dropbear RSA host keys for each cluster node.
 
     Keys are generated once with ssh-keygen and converted to dropbear's
     native format.  They persist in cluster-data/ssh-keys/vm{N}/ across
-    cluster rebuilds so each node keeps a stable host identity.
+    cluster rebuilds so each node keeps a stable host identity.  Missing
+    keys are generated concurrently; RSA prime search dominates and runs
+    in the ssh-keygen child processes.
     """
     os.makedirs(SSH_KEYS_DIR, exist_ok=True)
     has_dropbearconvert = shutil.which("dropbearconvert") is not None
 
+    todo = []
     for node_id in node_ids:
         key_dir = os.path.join(SSH_KEYS_DIR, f"vm{node_id}")
         os.makedirs(key_dir, exist_ok=True)
@@ -571,102 +838,18 @@ def ensure_ssh_host_keys(node_ids: list):
         if os.path.exists(dropbear_key):
             print(f"  [VM{node_id}] SSH host key: {dropbear_key} (existing)")
             continue
+        todo.append((node_id, key_dir))
 
-        # Generate OpenSSH RSA key pair (PEM / PKCS#1 format)
-        openssh_key = os.path.join(key_dir, "ssh_host_rsa_key")
-        subprocess.run(
-            [
-                "ssh-keygen",
-                "-t",
-                "rsa",
-                "-b",
-                "2048",
-                "-f",
-                openssh_key,
-                "-N",
-                "",
-                "-m",
-                "PEM",
-            ],
-            check=True,
-            capture_output=True,
-        )
-
-        if has_dropbearconvert:
-            subprocess.run(
-                ["dropbearconvert", "openssh", "dropbear", openssh_key, dropbear_key],
-                check=True,
-                capture_output=True,
-            )
-            print(
-                f"  [VM{node_id}] Generated SSH host key (ssh-keygen + dropbearconvert)"
-            )
-        else:
-            _convert_pem_to_dropbear(openssh_key, dropbear_key)
-            print(
-                f"  [VM{node_id}] Generated SSH host key (ssh-keygen + PEM->dropbear)"
-            )
-
-
-def inject_into_overlay(
-    overlay_path: str,
-    dropbear_key_path: str | None = None,
-    hostname: str | None = None,
-    netdevs_content: str | None = None,
-    log=print,
-) -> bool:
-    """Inject per-node files directly into a mountfs overlay's XFS rootfs.
-
-    Uses guestfish to write the SSH host key, hostname, and /etc/netdevs into
-    the overlay without any CPIO extract/repack cycle.
-    """
-    abs_overlay = os.path.abspath(overlay_path)
-    if not os.path.exists(abs_overlay):
-        log(f"  WARNING: {abs_overlay} not found, skipping overlay injection")
-        return False
-
-    gf_cmds = "run\nmount /dev/sda1 /\n"
-    temp_files = []
-
-    if dropbear_key_path and os.path.exists(dropbear_key_path):
-        abs_key = os.path.abspath(dropbear_key_path)
-        gf_cmds += "mkdir-p /etc/dropbear\n"
-        gf_cmds += f"upload {abs_key} /etc/dropbear/dropbear_rsa_host_key\n"
-        gf_cmds += "chmod 0600 /etc/dropbear/dropbear_rsa_host_key\n"
-
-    if hostname:
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".hostname", delete=False
-        ) as hf:
-            hf.write(hostname)
-            temp_files.append(hf.name)
-        gf_cmds += f"upload {hf.name} /etc/hostname\n"
-
-    if netdevs_content is not None:
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".netdevs", delete=False
-        ) as nf:
-            nf.write(netdevs_content)
-            temp_files.append(nf.name)
-        gf_cmds += f"upload {nf.name} /etc/netdevs\n"
-
-    gf_cmds += "umount /\n"
-
-    result = subprocess.run(
-        ["guestfish", "--rw", "-a", abs_overlay],
-        input=gf_cmds,
-        capture_output=True,
-        text=True,
-    )
-
-    for f in temp_files:
-        os.unlink(f)
-
-    if result.returncode != 0:
-        log(f"  WARNING: guestfish failed: {result.stderr}")
-        return False
-
-    return True
+    if not todo:
+        return
+    workers = min(len(todo), os.cpu_count() or 1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_generate_host_key, node_id, key_dir, has_dropbearconvert)
+            for node_id, key_dir in todo
+        ]
+        for future in futures:
+            print(future.result())
 
 
 # ---------------------------------------------------------------------------
@@ -674,100 +857,80 @@ def inject_into_overlay(
 # ---------------------------------------------------------------------------
 
 
-def setup(config: dict):
-    zones = [z for z in config["zones"] if z.get("id") != "GLOBAL"]
-    global_cfg = find_global(config["zones"])
-    uses_multiqueue_tap = any(
-        resolve_config(global_cfg, zone_cfg).get("nic_queues", 1) > 1
-        for zone_cfg in zones
-    )
+@dataclass
+class ZoneSetupError(RuntimeError):
+    zone: str
+    lines: list[str]
+    cause: BaseException
 
-    print("=== Setting up cluster topology ===\n")
+    def __str__(self) -> str:
+        return f"zone {self.zone} setup failed: {self.cause}"
 
-    # Disable bridge netfilter so iptables doesn't filter bridged traffic
-    # (DHCP, ICMP, ARP all need to pass through bridges unfiltered)
-    run("modprobe br_netfilter 2>/dev/null || true", quiet=True, privileged=True)
-    if uses_multiqueue_tap:
-        run("modprobe vhost_net 2>/dev/null || true", quiet=True, privileged=True)
-        ensure_vhost_net_available()
-    run(
-        "sysctl -q -w net.bridge.bridge-nf-call-iptables=0", quiet=True, privileged=True
-    )
-    run(
-        "sysctl -q -w net.bridge.bridge-nf-call-ip6tables=0",
-        quiet=True,
-        privileged=True,
-    )
-    run(
-        "sysctl -q -w net.bridge.bridge-nf-call-arptables=0",
-        quiet=True,
-        privileged=True,
-    )
 
-    for zone_cfg in zones:
+def _setup_zone(
+    zone_cfg: dict,
+    global_cfg: dict,
+    existing_links: set[str],
+    libvirt_ifaces: dict[str, list[tuple[str, str]]],
+    real_user: str,
+    real_uid: int,
+) -> list[str]:
+    """Create one zone's bridge, TAPs, and ivshmem files; return its log lines.
+
+    Zones own disjoint ``wos-<zone>-*`` links and ivshmem files, so setup()
+    runs them concurrently and prints each zone's log in config order.
+    """
+    lines: list[str] = []
+    log = lines.append
+    batch = CommandBatcher(log=log)
+    # Fatal batch lines whose failure has a more specific error than the zone's.
+    fatal_errors: dict[str, str] = {}
+    try:
         zname = zone_name(zone_cfg)
         num_nodes = zone_cfg.get("nodes", 2)
         effective = resolve_config(global_cfg, zone_cfg)
         mtu = effective.get("mtu", 9000)
 
-        print(f"--- Zone: {zname} ({num_nodes} nodes) ---")
+        log(f"--- Zone: {zname} ({num_nodes} nodes) ---")
 
         # Create bridge
         br = bridge_name(zone_cfg)
         bridge_cfg = effective.get("bridge", {})
+        uplink = bridge_cfg.get("uplink")
+        taps = [tap_name(zone_cfg, node_id) for node_id in range(num_nodes)]
         bridge_created = False
-        if not link_exists(br):
-            run(f"ip link add {br} type bridge", privileged=True)
+        if br not in existing_links:
+            batch.add(f"ip link add {br} type bridge")
+            existing_links.add(br)
             bridge_created = True
 
         # Reconcile existing bridges too; stale/down links leave TAP traffic
         # invisible even when QEMU has opened the right interface names.
-        run(f"ip link set {br} mtu {mtu}", privileged=True)
+        batch.add(f"ip link set {br} mtu {mtu}")
         if not bridge_cfg.get("stp", False):
-            run(
-                f"sh -c 'echo 0 > /sys/class/net/{br}/bridge/stp_state'",
-                quiet=True,
-                privileged=True,
-            )
-        run(f"ip link set {br} up", privileged=True)
+            batch.add(f"echo 0 > /sys/class/net/{br}/bridge/stp_state", quiet=True)
+        batch.add(f"ip link set {br} up")
         if bridge_created:
-            print(f"  Created bridge: {br} (MTU {mtu})")
+            log(f"  Created bridge: {br} (MTU {mtu})")
         else:
-            print(f"  Bridge {br} already exists")
-
-        # Re-attach any running libvirt VM interfaces that belong on this bridge
-        # (they get detached when the bridge is recreated)
-        reattach_libvirt_vms(br)
+            log(f"  Bridge {br} already exists")
 
         # Attach uplink device to bridge (e.g. vmnet1 for router VM access)
-        uplink = bridge_cfg.get("uplink")
         if uplink:
-            if link_exists(uplink):
+            if uplink in existing_links:
                 # Remove existing IP from uplink to avoid conflicts
-                run(f"ip addr flush dev {uplink}", quiet=True, privileged=True)
-                run(f"ip link set {uplink} master {br}", privileged=True)
-                run(f"ip link set {uplink} up", privileged=True)
-                print(f"  Attached uplink: {uplink} -> {br}")
+                batch.add(f"ip addr flush dev {uplink}", quiet=True)
+                batch.add(f"ip link set {uplink} master {br}")
+                batch.add(f"ip link set {uplink} up")
+                log(f"  Attached uplink: {uplink} -> {br}")
             else:
-                print(f"  WARNING: uplink {uplink} not found - skipping")
-
-        # Assign IP to bridge if specified
-        ip_addr = bridge_cfg.get("ip")
-        if ip_addr:
-            configure_bridge_ip(br, ip_addr)
-
-        # Host-only .wos DNS for this bridge.  Guest resolver state still comes
-        # from DHCP/netd inside WOS; this only updates the host link in resolved.
-        configure_bridge_dns(br, bridge_cfg.get("dns"))
+                log(f"  WARNING: uplink {uplink} not found - skipping")
 
         # Create TAP devices
-        real_user = os.environ.get("SUDO_USER") or pwd.getpwuid(os.getuid()).pw_name
-        real_uid = pwd.getpwnam(real_user).pw_uid
-        for node_id in range(num_nodes):
-            tap = tap_name(zone_cfg, node_id)
-            queue_count = effective.get("nic_queues", 1)
-            need_mq = queue_count > 1
-            tap_exists = link_exists(tap)
+        queue_count = effective.get("nic_queues", 1)
+        need_mq = queue_count > 1
+        for tap in taps:
+            tap_exists = tap in existing_links
             existing_owner = tap_owner_uid(tap) if tap_exists else None
             missing_mq = need_mq and tap_exists and not tap_has_multiqueue(tap)
 
@@ -780,58 +943,165 @@ def setup(config: dict):
                     if existing_owner != real_uid
                     else "multi_queue flag missing"
                 )
-                print(f"  TAP {tap}: recreating ({reason})")
-                run(f"ip link set {tap} down", check=False, quiet=True, privileged=True)
-                run(f"ip link set {tap} nomaster", check=False, quiet=True, privileged=True)
-                if not run(f"ip tuntap del dev {tap} mode tap", privileged=True):
-                    raise RuntimeError(f"failed to delete stale TAP {tap}")
-                if link_exists(tap):
-                    raise RuntimeError(f"stale TAP {tap} still exists after delete")
+                log(f"  TAP {tap}: recreating ({reason})")
+                batch.add(f"ip link set {tap} down", check=False, quiet=True)
+                batch.add(f"ip link set {tap} nomaster", check=False, quiet=True)
+                delete = f"ip tuntap del dev {tap} mode tap"
+                batch.add(delete, fatal=True)
+                fatal_errors[delete] = f"failed to delete stale TAP {tap}"
+                # A TAP still held open can survive the delete; never re-attach it.
+                gone = f"test ! -e /sys/class/net/{tap}"
+                batch.add(gone, quiet=True, fatal=True)
+                fatal_errors[gone] = f"stale TAP {tap} still exists after delete"
+                existing_links.discard(tap)
+                tap_exists = False
 
             tap_created = False
-            if not link_exists(tap):
+            if not tap_exists:
                 mq_flag = " multi_queue" if need_mq else ""
-                run(
-                    f"ip tuntap add dev {tap} mode tap{mq_flag} user {real_user}",
-                    privileged=True,
-                )
+                batch.add(f"ip tuntap add dev {tap} mode tap{mq_flag} user {real_user}")
+                existing_links.add(tap)
                 tap_created = True
 
             # Re-attach and bring up existing TAPs every time.  A stale TAP can
             # retain multi_queue but lose its bridge master or UP state.
-            run(f"ip link set {tap} master {br}", privileged=True)
-            run(f"ip link set {tap} mtu {mtu}", privileged=True)
-            run(f"ip link set {tap} up", privileged=True)
+            batch.add(f"ip link set {tap} master {br}")
+            batch.add(f"ip link set {tap} mtu {mtu}")
+            batch.add(f"ip link set {tap} up")
             if tap_created:
-                print(f"  Created TAP: {tap}" + (" (multi_queue)" if need_mq else ""))
+                log(f"  Created TAP: {tap}" + (" (multi_queue)" if need_mq else ""))
             else:
-                print(f"  TAP {tap} already exists; reconciled {br}/MTU/up" + (" (multi_queue)" if need_mq else ""))
+                log(f"  TAP {tap} already exists; reconciled {br}/MTU/up" + (" (multi_queue)" if need_mq else ""))
 
-            if need_mq and not tap_has_multiqueue(tap):
-                raise RuntimeError(f"TAP {tap} is not multi_queue but nic_queues={queue_count}")
-
-        # Create ivshmem backing files (pre-created so both VMs share the same file)
+        # Create ivshmem backing files (pre-created so both VMs share the same file).
+        # Always recreate for clean state; a root-owned file from a previous run
+        # can only be unlinked with sudo, so stale files go through the batch.
         links = ivshmem_links(zone_cfg, num_nodes)
+        ivshmem_paths = []
         if links:
             ivshmem_cfg = effective.get("ivshmem", {})
             root_path = ivshmem_cfg.get("root_path", "/dev/shm")
             size_str = ivshmem_cfg.get("size", "16M")
             size_bytes = parse_size(size_str)
-            size_mb = size_bytes // (1024 * 1024)
-
             for node_a, node_b in links:
                 fpath = ivshmem_file(root_path, zone_cfg, node_a, node_b)
-                # Always recreate for clean state; use sudo for dd/chmod in case
-                # a previous root-owned file exists
-                run(
-                    f"dd if=/dev/zero of={fpath} bs=1M count={size_mb} 2>/dev/null",
-                    quiet=True,
-                    privileged=True,
-                )
-                run(f"chmod 666 {fpath}", quiet=True, privileged=True)
-                print(f"  Created ivshmem: {fpath} ({size_str})")
+                if os.path.lexists(fpath):
+                    batch.add(f"rm -f {fpath}", check=False, quiet=True)
+                ivshmem_paths.append(fpath)
+
+        if not batch.flush():
+            for cmd in batch.failed:
+                if cmd in fatal_errors:
+                    raise RuntimeError(fatal_errors[cmd])
+            raise RuntimeError(f"privileged topology setup failed for zone {zname}")
+
+        # root_path may not be user-writable; those files are created by one
+        # sudo shell afterwards instead of a sudo round-trip per command.
+        fallback = CommandBatcher(log=log)
+        for fpath in ivshmem_paths:
+            try:
+                create_ivshmem_file(fpath, size_bytes)
+            except PermissionError:
+                fallback.add(f"truncate -s {size_bytes} {fpath}", quiet=True, fatal=True)
+                fallback.add(f"chmod 666 {fpath}", quiet=True, fatal=True)
+        if fallback.commands and not fallback.flush():
+            raise RuntimeError(f"privileged ivshmem file creation failed for zone {zname}")
+        for fpath in ivshmem_paths:
+            log(f"  Created ivshmem: {fpath} ({size_str})")
+
+        if need_mq:
+            for tap in taps:
+                if not tap_has_multiqueue(tap):
+                    raise RuntimeError(f"TAP {tap} is not multi_queue but nic_queues={queue_count}")
+
+        # Re-attach any running libvirt VM interfaces that belong on this bridge
+        # (they get detached when the bridge is recreated)
+        reattach_libvirt_vms(br, libvirt_ifaces.get(br, []), existing_links, log=log)
+
+        # Assign IP to bridge if specified
+        ip_addr = bridge_cfg.get("ip")
+        if ip_addr:
+            configure_bridge_ip(br, ip_addr, log=log)
+
+        # Host-only .wos DNS for this bridge.  Guest resolver state still comes
+        # from DHCP/netd inside WOS; this only updates the host link in resolved.
+        configure_bridge_dns(br, bridge_cfg.get("dns"), log=log)
+    except Exception as exc:
+        raise ZoneSetupError(zone=zone_name(zone_cfg), lines=lines, cause=exc) from exc
+    return lines
 
-        print()
+
+def setup(config: dict):
+    global_cfg, zones = split_zones(config)
+    uses_multiqueue_tap = any(
+        resolve_config(global_cfg, zone_cfg).get("nic_queues", 1) > 1
+        for zone_cfg in zones
+    )
+
+    print("=== Setting up cluster topology ===\n")
+
+    # Disable bridge netfilter so iptables doesn't filter bridged traffic
+    # (DHCP, ICMP, ARP all need to pass through bridges unfiltered)
+    # Re-runs usually find everything already in place, so only queue what
+    # the unprivileged /sys and /proc reads say is missing.
+    batch = CommandBatcher()
+    modules = ["br_netfilter"] + (["vhost_net"] if uses_multiqueue_tap else [])
+    for module_name in modules:
+        if not kernel_module_present(module_name):
+            batch.add(f"modprobe {module_name} 2>/dev/null || true", quiet=True)
+    sysctls = [
+        f"{key}=0"
+        for key in (
+            "net.bridge.bridge-nf-call-iptables",
+            "net.bridge.bridge-nf-call-ip6tables",
+            "net.bridge.bridge-nf-call-arptables",
+        )
+        if read_sysctl(key) != "0"
+    ]
+    if sysctls:
+        batch.add(f"sysctl -q -w {' '.join(sysctls)}", quiet=True)
+    # This batch doubles as the up-front sudo prompt: the zone workers below
+    # run their batches concurrently and must find credentials cached.
+    if batch.commands:
+        if not batch.flush():
+            print("ERROR: Failed to obtain sudo privileges.", file=sys.stderr)
+            sys.exit(1)
+    else:
+        ensure_sudo()
+    if uses_multiqueue_tap:
+        ensure_vhost_net_available()
+
+    real_user = os.environ.get("SUDO_USER") or pwd.getpwuid(os.getuid()).pw_name
+    real_uid = pwd.getpwnam(real_user).pw_uid
+
+    # Snapshot host links once; the set is updated as the batches mutate it.
+    existing_links = link_inventory()
+    libvirt_ifaces = libvirt_bridge_ifaces() if zones else {}
+
+    if zones:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(zones), 8)) as executor:
+            futures = [
+                executor.submit(
+                    _setup_zone,
+                    zone_cfg,
+                    global_cfg,
+                    existing_links,
+                    libvirt_ifaces,
+                    real_user,
+                    real_uid,
+                )
+                for zone_cfg in zones
+            ]
+            for future in futures:
+                try:
+                    lines = future.result()
+                except ZoneSetupError as exc:
+                    for line in exc.lines:
+                        print(line)
+                    raise exc.cause
+                for line in lines:
+                    print(line)
+                print()
 
     # Generate persistent SSH host keys for all unique nodes
     all_node_ids = set()
@@ -853,45 +1123,46 @@ def setup(config: dict):
 
 
 def teardown(config: dict):
-    zones = [z for z in config["zones"] if z.get("id") != "GLOBAL"]
-    global_cfg = find_global(config["zones"])
+    global_cfg, zones = split_zones(config)
 
     print("=== Tearing down cluster topology ===\n")
 
+    batch = CommandBatcher()
+    # Deletions are reported only once the privileged batch has run.
+    report: list[str] = []
+    existing_links = link_inventory()
     for zone_cfg in zones:
         zname = zone_name(zone_cfg)
         num_nodes = zone_cfg.get("nodes", 2)
         effective = resolve_config(global_cfg, zone_cfg)
 
-        print(f"--- Zone: {zname} ---")
+        report.append(f"--- Zone: {zname} ---")
 
         # Detach uplink from bridge before deleting
         bridge_cfg = effective.get("bridge", {})
         uplink = bridge_cfg.get("uplink")
-        if uplink and link_exists(uplink):
-            run(
-                f"ip link set {uplink} nomaster",
-                check=False,
-                quiet=True,
-                privileged=True,
-            )
-            print(f"  Detached uplink: {uplink}")
+        if uplink and uplink in existing_links:
+            batch.add(f"ip link set {uplink} nomaster", check=False, quiet=True)
+            report.append(f"  Detached uplink: {uplink}")
 
         # Delete TAP devices
         for node_id in range(num_nodes):
             tap = tap_name(zone_cfg, node_id)
-            if link_exists(tap):
-                run(f"ip link set {tap} down", check=False, quiet=True, privileged=True)
-                run(f"ip tuntap del dev {tap} mode tap", check=False, privileged=True)
-                print(f"  Deleted TAP: {tap}")
+            if tap in existing_links:
+                batch.add(f"ip link set {tap} down", check=False, quiet=True)
+                batch.add(f"ip tuntap del dev {tap} mode tap", check=False)
+                existing_links.discard(tap)
+                report.append(f"  Deleted TAP: {tap}")
 
         # Delete bridge
         br = bridge_name(zone_cfg)
-        if link_exists(br):
-            revert_bridge_dns(br)
-            run(f"ip link set {br} down", check=False, quiet=True, privileged=True)
-            run(f"ip link delete {br} type bridge", check=False, privileged=True)
-            print(f"  Deleted bridge: {br}")
+        if br in existing_links:
+            if shutil.which("resolvectl") is not None:
+                batch.add(f"resolvectl revert {shlex.quote(br)}", check=False, quiet=True)
+            batch.add(f"ip link set {br} down", check=False, quiet=True)
+            batch.add(f"ip link delete {br} type bridge", check=False)
+            existing_links.discard(br)
+            report.append(f"  Deleted bridge: {br}")
 
         # Delete ivshmem files
         links = ivshmem_links(zone_cfg, num_nodes)
@@ -901,10 +1172,16 @@ def teardown(config: dict):
             for node_a, node_b in links:
                 fpath = ivshmem_file(root_path, zone_cfg, node_a, node_b)
                 if os.path.exists(fpath):
-                    run(f"rm -f {fpath}", check=False, quiet=True, privileged=True)
-                    print(f"  Deleted ivshmem: {fpath}")
+                    batch.add(f"rm -f {fpath}", check=False, quiet=True)
+                    report.append(f"  Deleted ivshmem: {fpath}")
 
-        print()
+        report.append("")
+
+    # One sudo shell for every zone; it prompts for credentials if needed.
+    if batch.commands and not batch.flush():
+        print("ERROR: privileged teardown failed.", file=sys.stderr)
+        sys.exit(1)
+    print("\n".join(report))
 
     # Remove overlay directories derived from this config's VM specs.
     overlay_dirs = set()
@@ -919,8 +1196,6 @@ def teardown(config: dict):
     for overlay_dir in sorted(overlay_dirs):
         if not os.path.isdir(overlay_dir):
             continue
-        import shutil
-
         shutil.rmtree(overlay_dir)
         print(f"  Removed {overlay_dir}/")
 
@@ -1027,23 +1302,30 @@ def cluster_launch_guard(*, reject_running_qemus: bool = True):
 
 
 def collect_unique_nodes(config: dict) -> dict:
-    """Build a map: node_id -> list of (zone_cfg, effective_cfg, node_cfg)."""
-    zones = [z for z in config["zones"] if z.get("id") != "GLOBAL"]
-    global_cfg = find_global(config["zones"])
+    """Build a map: node_id -> {effective, node_override, zones, zone_effective}.
+
+    ``zone_effective[i]`` is the resolved GLOBAL -> zone -> node config for
+    ``zones[i]``.
+    """
+    global_cfg, zones = split_zones(config)
 
     nodes = {}
     for zone_cfg in zones:
         num_nodes = zone_cfg.get("nodes", 2)
+        overrides = node_configs_by_id(zone_cfg)
         for node_id in range(num_nodes):
-            node_override = get_node_config(zone_cfg, node_id)
+            node_override = overrides.get(node_id, {})
             effective = resolve_config(global_cfg, zone_cfg, node_override)
             if node_id not in nodes:
                 nodes[node_id] = {
-                    "effective": effective,
+                    "effective": dict(effective),
                     "node_override": node_override,
                     "zones": [],
+                    "zone_effective": [],
                 }
             nodes[node_id]["zones"].append(zone_cfg)
+            # Kept per zone so cluster_node_spec() need not resolve again.
+            nodes[node_id]["zone_effective"].append(effective)
             # Merge node-level settings (debug, memory, etc.) from any zone
             if node_override.get("debug"):
                 nodes[node_id]["effective"]["debug"] = True
@@ -1078,8 +1360,7 @@ def link_master(link: dict) -> str | None:
 
 def validate_no_setup_topology(config: dict) -> None:
     """Validate the already-created topology before rootless VM launch."""
-    zones = [z for z in config["zones"] if z.get("id") != "GLOBAL"]
-    global_cfg = find_global(config["zones"])
+    global_cfg, zones = split_zones(config)
     failures: list[str] = []
 
     for zone_cfg in zones:
@@ -2059,15 +2340,22 @@ def cluster_node_spec(node_id: int, node_info: dict, config: dict) -> dict:
         "id": node_id,
         "hostname": eff.get("hostname", f"wos-{node_id}"),
         "debug": bool(eff.get("debug", False)),
-        "vm": deepcopy(eff.get("vm", {})),
+        "vm": node_setup.copy_json(eff.get("vm", {})),
         "nics": [],
         "ivshmem": [],
     }
 
-    for zone_cfg in node_info["zones"]:
+    # collect_unique_nodes() carries the per-zone node configs; resolve them
+    # here only for hand-built node_info dicts.
+    node_effs = node_info.get("zone_effective")
+    if node_effs is None:
+        node_effs = [
+            resolve_config(global_cfg, zone_cfg, get_node_config(zone_cfg, node_id))
+            for zone_cfg in node_info["zones"]
+        ]
+
+    for zone_cfg, zone_eff in zip(node_info["zones"], node_effs):
         zone_id = zone_cfg["id"]
-        node_override = get_node_config(zone_cfg, node_id)
-        zone_eff = resolve_config(global_cfg, zone_cfg, node_override)
         spec["nics"].append(
             {
                 "name": zone_name(zone_cfg),
@@ -2087,19 +2375,18 @@ def cluster_node_spec(node_id: int, node_info: dict, config: dict) -> dict:
     for zone_cfg in node_info["zones"]:
         zone_eff = resolve_config(global_cfg, zone_cfg)
         num_nodes = zone_cfg.get("nodes", 2)
-        links = ivshmem_links(zone_cfg, num_nodes)
+        links = ivshmem_links_for_node(zone_cfg, num_nodes, node_id)
         ivshmem_cfg = zone_eff.get("ivshmem", {})
         root_path = ivshmem_cfg.get("root_path", "/dev/shm")
         size_str = ivshmem_cfg.get("size", "16M")
 
         for node_a, node_b in links:
-            if node_a == node_id or node_b == node_id:
-                spec["ivshmem"].append(
-                    {
-                        "path": ivshmem_file(root_path, zone_cfg, node_a, node_b),
-                        "size": size_str,
-                    }
-                )
+            spec["ivshmem"].append(
+                {
+                    "path": ivshmem_file(root_path, zone_cfg, node_a, node_b),
+                    "size": size_str,
+                }
+            )
 
     return node_setup.normalize_node_spec(spec)
 
@@ -2111,9 +2398,14 @@ def build_qemu_args(
     tcg_level: str | None = None,
     debug_nodes: set[int] | None = None,
     log=print,
+    spec: dict | None = None,
 ) -> list:
-    """Build QEMU command line for a single cluster node."""
-    spec = cluster_node_spec(node_id, node_info, config)
+    """Build QEMU command line for a single cluster node.
+
+    Pass ``spec`` when the caller already built it with cluster_node_spec().
+    """
+    if spec is None:
+        spec = cluster_node_spec(node_id, node_info, config)
     force_debug = debug_nodes is not None and node_id in debug_nodes
     return node_setup.build_qemu_args(
         spec,
@@ -2140,16 +2432,23 @@ class LaunchResult:
     lines: list[str]
 
 
-def launch_one_vm(
+@dataclass
+class PreparedLaunch:
+    node_id: int
+    args: list
+    lines: list[str]
+    hostname: str
+    injection: dict | None
+
+
+def prepare_vm_launch(
     node_id: int,
     node_info: dict,
     config: dict,
     tcg_level: str | None,
     debug_nodes: set[int] | None,
-    processes: list,
-    processes_lock: threading.Lock,
-    stopping: threading.Event,
-) -> LaunchResult:
+) -> PreparedLaunch:
+    """Build overlays and QEMU argv for one node without starting it."""
     lines = []
 
     try:
@@ -2161,6 +2460,7 @@ def launch_one_vm(
             tcg_level=tcg_level,
             debug_nodes=debug_nodes,
             log=lines.append,
+            spec=node_spec,
         )
 
         zone_names = [zone_name(z) for z in node_info["zones"]]
@@ -2171,7 +2471,7 @@ def launch_one_vm(
         lines.append(f"  [VM{node_id}] zones={zone_names} debug={is_debug}")
         lines.append(f"    cmd: {' '.join(args)}")
 
-        # Inject per-node files into the mountfs overlay.
+        # Per-node files for the mountfs overlay; injected in one batch later.
         _, mountfs_overlay = node_setup.overlay_paths(node_spec)
         dropbear_key = os.path.join(
             SSH_KEYS_DIR, f"vm{node_id}", "dropbear_rsa_host_key"
@@ -2179,36 +2479,76 @@ def launch_one_vm(
         node_hostname = node_setup.node_hostname(node_spec)
         key_path = dropbear_key if os.path.exists(dropbear_key) else None
 
-        # Build /etc/netdevs from shared node spec NIC order, matching QEMU.
-        netdevs_content = node_setup.netdevs_content(
-            node_spec,
-            generated_by="cluster_setup.py",
+        injection = None
+        if os.path.exists(mountfs_overlay):
+            injection = {
+                "overlay": mountfs_overlay,
+                "dropbear_key_path": key_path,
+                "hostname": node_hostname,
+                # Build /etc/netdevs from shared node spec NIC order, matching QEMU.
+                "netdevs": node_setup.netdevs_content(
+                    node_spec,
+                    generated_by="cluster_setup.py",
+                ),
+            }
+
+        return PreparedLaunch(
+            node_id=node_id,
+            args=args,
+            lines=lines,
+            hostname=node_hostname,
+            injection=injection,
         )
+    except Exception as exc:
+        raise LaunchError(node_id=node_id, lines=lines, cause=exc) from exc
 
-        if os.path.exists(mountfs_overlay):
-            if inject_into_overlay(
-                mountfs_overlay,
-                dropbear_key_path=key_path,
-                hostname=node_hostname,
-                netdevs_content=netdevs_content,
-                log=lines.append,
-            ):
-                lines.append(
-                    f"    Injected per-node overlay (hostname={node_hostname})"
-                )
-            else:
-                lines.append("    WARNING: Failed to inject SSH host key")
 
+def inject_prepared_overlays(prepared: list[PreparedLaunch]) -> None:
+    """Inject every prepared node's overlay with one guestfish appliance.
+
+    If the shared session fails, retry per overlay so one bad image only
+    costs its own node the injected files.
+    """
+    pending = [p for p in prepared if p.injection is not None]
+    if not pending:
+        return
+
+    batch_lines: list[str] = []
+    if len(pending) > 1 and node_setup.inject_into_overlays(
+        [p.injection for p in pending], log=batch_lines.append
+    ):
+        for p in pending:
+            p.lines.append(f"    Injected per-node overlay (hostname={p.hostname})")
+        return
+
+    # Keep the shared session's diagnostics; the retry would otherwise hide them.
+    for p in pending:
+        p.lines.extend(batch_lines)
+        if node_setup.inject_into_overlays([p.injection], log=p.lines.append):
+            p.lines.append(f"    Injected per-node overlay (hostname={p.hostname})")
+        else:
+            p.lines.append("    WARNING: Failed to inject SSH host key")
+
+
+def start_prepared_vm(
+    prepared: PreparedLaunch,
+    processes: list,
+    processes_lock: threading.Lock,
+    stopping: threading.Event,
+) -> LaunchResult:
+    lines = prepared.lines
+
+    try:
         with processes_lock:
             if stopping.is_set():
                 raise RuntimeError("launch cancelled")
-            proc = subprocess.Popen(args)
+            proc = subprocess.Popen(prepared.args)
             processes.append(proc)
         lines.append(f"    PID: {proc.pid}")
 
-        return LaunchResult(node_id=node_id, process=proc, lines=lines)
+        return LaunchResult(node_id=prepared.node_id, process=proc, lines=lines)
     except Exception as exc:
-        raise LaunchError(node_id=node_id, lines=lines, cause=exc) from exc
+        raise LaunchError(node_id=prepared.node_id, lines=lines, cause=exc) from exc
 
 
 def launch(
@@ -2286,41 +2626,53 @@ def launch_guarded(
     signal.signal(signal.SIGINT, shutdown)
     signal.signal(signal.SIGTERM, shutdown)
 
+    def abort_launch(exc: LaunchError):
+        stopping.set()
+        for line in exc.lines:
+            print(line)
+        print(f"ERROR: {exc}", file=sys.stderr)
+        stop_all_vms()
+        sys.exit(1)
+
+    # Overlays and argv are built concurrently; overlay injection then shares
+    # one guestfish appliance before the VMs are started in node order.
     max_workers = len(nodes)
     futures = {}
+    prepared: list[PreparedLaunch] = []
     try:
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
             futures = {
                 executor.submit(
-                    launch_one_vm,
+                    prepare_vm_launch,
                     node_id,
                     nodes[node_id],
                     config,
                     tcg_level,
                     debug_nodes,
-                    pids,
-                    pids_lock,
-                    stopping,
                 ): node_id
                 for node_id in sorted(nodes.keys())
             }
 
             try:
                 for future in concurrent.futures.as_completed(futures):
-                    result = future.result()
-                    for line in result.lines:
-                        print(line)
+                    prepared.append(future.result())
             except LaunchError as exc:
-                stopping.set()
-                for line in exc.lines:
-                    print(line)
-                print(f"ERROR: {exc}", file=sys.stderr)
                 for future in futures:
                     future.cancel()
-                stop_all_vms()
-                sys.exit(1)
+                abort_launch(exc)
             except KeyboardInterrupt:
                 shutdown(None, None)
+
+        prepared.sort(key=lambda p: p.node_id)
+        inject_prepared_overlays(prepared)
+
+        for p in prepared:
+            try:
+                result = start_prepared_vm(p, pids, pids_lock, stopping)
+            except LaunchError as exc:
+                abort_launch(exc)
+            for line in result.lines:
+                print(line)
     except KeyboardInterrupt:
         shutdown(None, None)
 
@@ -2435,8 +2787,6 @@ def main():
     elif args.teardown:
         try:
             with cluster_launch_guard(reject_running_qemus=False):
-                # Cache sudo credentials once upfront for privileged network operations.
-                ensure_sudo()
                 teardown(config)
         except LaunchConflictError as exc:
             print(f"ERROR: {exc}", file=sys.stderr)
@@ -2444,8 +2794,6 @@ def main():
     elif args.launch:
         try:
             with cluster_launch_guard():
-                if not args.no_setup:
-                    ensure_sudo()
                 launch_guarded(
                     config,
                     tcg_level=args.tcg,
@@ -2458,7 +2806,6 @@ def main():
     else:
         try:
             with cluster_launch_guard():
-                ensure_sudo()
                 setup(config)
         except LaunchConflictError as exc:
             print(f"ERROR: {exc}", file=sys.stderr)
@@ -11,10 +11,10 @@ from __future__ import annotations
 
 import json
 import os
+import shlex
 import subprocess
-import tempfile
-from copy import deepcopy
 from pathlib import Path
+from typing import Iterator
 
 
 DEFAULT_VM_CONFIG = {
@@ -33,6 +33,12 @@ TCG_LOG_LEVELS = {
     "none": "",
 }
 
+# Node-independent argv fragments, shared by every build_qemu_args() call.
+KVM_ACCEL_ARGS = ("-cpu", "host,migratable=no,+invtsc", "--enable-kvm")
+TCG_ACCEL_ARGS = ("-accel", "tcg,thread=multi", "-cpu", "max")
+AHCI_ARGS = ("-device", "ahci,id=ahci", "-device", "ide-hd,drive=drive0,bus=ahci.0")
+SERIAL_DISPLAY_ARGS = ("-serial", "chardev:char0", "-display", "none")
+
 
 class OverlayCreationError(RuntimeError):
     def __init__(self, overlay: Path, base_disk: Path, stderr: str):
@@ -52,10 +58,17 @@ def load_json_config(path: str | Path) -> dict:
         return json.load(f)
 
 
+def copy_json(value):
+    """Deep-copy JSON-shaped data (dicts, lists, scalars) without deepcopy's memo."""
+    if isinstance(value, dict):
+        return {key: copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_json(item) for item in value]
+    return value
+
+
 def merge_section(base: dict, override: dict) -> dict:
-    result = deepcopy(base)
-    result.update(override)
-    return result
+    return {**base, **override}
 
 
 def normalize_node_spec(raw: dict) -> dict:
@@ -65,18 +78,28 @@ def normalize_node_spec(raw: dict) -> dict:
     ``{"node": {...}}``.
     """
     source = raw.get("node", raw)
-    spec = deepcopy(source)
+    spec = copy_json(source)
     node_id = int(spec.get("id", 0))
 
     spec["id"] = node_id
     spec["hostname"] = spec.get("hostname", f"wos-{node_id}")
     spec["debug"] = bool(spec.get("debug", False))
     spec["vm"] = merge_section(DEFAULT_VM_CONFIG, spec.get("vm", {}))
-    spec["nics"] = [deepcopy(nic) for nic in spec.get("nics", [])]
-    spec["ivshmem"] = [deepcopy(dev) for dev in spec.get("ivshmem", [])]
+    spec["nics"] = spec.get("nics", [])
+    spec["ivshmem"] = spec.get("ivshmem", [])
     return spec
 
 
+def _spec_view(raw: dict) -> tuple[dict, dict]:
+    """Read-only (spec, vm) view of a raw or normalised spec, without copying.
+
+    The argv/overlay/log helpers only read the spec, so they use this instead
+    of paying for a full normalize_node_spec() copy on every call.
+    """
+    spec = raw.get("node", raw)
+    return spec, merge_section(DEFAULT_VM_CONFIG, spec.get("vm", {}))
+
+
 def load_node_config(path: str | Path) -> dict:
     return normalize_node_spec(load_json_config(path))
 
@@ -94,8 +117,7 @@ def node_debug_enabled(spec: dict, force_debug: bool = False) -> bool:
 
 
 def overlay_paths(spec: dict) -> tuple[Path, Path]:
-    spec = normalize_node_spec(spec)
-    vm_cfg = spec["vm"]
+    spec, vm_cfg = _spec_view(spec)
     nid = node_id(spec)
     overlay_dir = Path(vm_cfg.get("overlay_dir", "cluster-overlays"))
     overlay0 = Path(vm_cfg.get("disk0_overlay", overlay_dir / f"disk-vm{nid}.qcow2"))
@@ -104,49 +126,51 @@ def overlay_paths(spec: dict) -> tuple[Path, Path]:
 
 
 def serial_log_path(spec: dict) -> Path:
-    spec = normalize_node_spec(spec)
-    vm_cfg = spec["vm"]
+    spec, vm_cfg = _spec_view(spec)
     return Path(vm_cfg.get("serial_log", f"serial-vm{node_id(spec)}.log"))
 
 
 def qemu_log_path(spec: dict, tcg_level: str | None = None) -> Path:
-    spec = normalize_node_spec(spec)
-    vm_cfg = spec["vm"]
+    spec, vm_cfg = _spec_view(spec)
     if tcg_level is not None:
         return Path(vm_cfg.get("tcg_log", f"qemu-vm{node_id(spec)}-cpu%d.log"))
     return Path(vm_cfg.get("qemu_log", f"qemu-vm{node_id(spec)}.log"))
 
 
-def run_shell(cmd: str, check=True, quiet=False, privileged=False) -> bool:
+def run_command(args: list[str], check=True, quiet=False, privileged=False) -> bool:
+    """Run an argv list directly; no /bin/sh sits between us and the tool."""
     if privileged:
-        cmd = f"sudo {cmd}"
+        args = ["sudo", *args]
     if not quiet:
-        print(f"  $ {cmd}")
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        print(f"  $ {shlex.join(args)}")
+    result = subprocess.run(args, capture_output=True, text=True)
     if check and result.returncode != 0:
         print(f"    FAILED: {result.stderr.strip()}")
         return False
     return True
 
 
-def remove_existing_file(path: Path):
-    if not path.exists():
-        return
-    try:
-        path.unlink()
-    except PermissionError:
-        run_shell(f"rm -f {path}", quiet=True, privileged=True)
+def remove_existing_files(*paths: Path):
+    """Unlink each path if present; root-owned leftovers share one sudo rm."""
+    denied = []
+    for path in paths:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            denied.append(str(path))
+    if denied:
+        run_command(["rm", "-f", *denied], quiet=True, privileged=True)
 
 
 def prepare_node_overlays(spec: dict, log=print) -> tuple[Path, Path]:
-    spec = normalize_node_spec(spec)
-    vm_cfg = spec["vm"]
+    spec, vm_cfg = _spec_view(spec)
     overlay0, overlay1 = overlay_paths(spec)
     overlay0.parent.mkdir(parents=True, exist_ok=True)
     overlay1.parent.mkdir(parents=True, exist_ok=True)
 
-    for path in (overlay0, overlay1):
-        remove_existing_file(path)
+    remove_existing_files(overlay0, overlay1)
 
     created_overlays: list[Path] = []
     try:
@@ -172,36 +196,85 @@ def prepare_node_overlays(spec: dict, log=print) -> tuple[Path, Path]:
             if result.returncode != 0:
                 stderr = result.stderr.strip()
                 log(f"  ERROR creating overlay {overlay}: {stderr}")
-                remove_existing_file(overlay)
+                remove_existing_files(overlay)
                 raise OverlayCreationError(overlay, base_disk, stderr)
             created_overlays.append(overlay)
     except Exception:
-        for overlay in created_overlays:
-            remove_existing_file(overlay)
+        remove_existing_files(*created_overlays)
         raise
 
     return overlay0, overlay1
 
 
 def cleanup_node_logs(spec: dict):
-    spec = normalize_node_spec(spec)
+    spec, _ = _spec_view(spec)
     nid = node_id(spec)
     qemu_log = qemu_log_path(spec)
     log_dir = qemu_log.parent
     log_stem = qemu_log.name.removesuffix(".log")
 
-    patterns = (
-        qemu_log.name,
-        f"{log_stem}.*log",
-        f"qemu-vm{nid}-cpu*.log",
-    )
-    for pattern in patterns:
-        for path in log_dir.glob(pattern):
-            path.unlink()
+    # One directory scan with plain string tests instead of three glob passes.
+    stem_prefix = f"{log_stem}."
+    cpu_prefix = f"qemu-vm{nid}-cpu"
+    try:
+        with os.scandir(log_dir) as entries:
+            stale = [
+                entry.path
+                for entry in entries
+                if entry.name == qemu_log.name
+                or (entry.name.startswith(stem_prefix) and entry.name.endswith("log"))
+                or (entry.name.startswith(cpu_prefix) and entry.name.endswith(".log"))
+            ]
+    except FileNotFoundError:
+        stale = []
+    for path in stale:
+        os.unlink(path)
 
-    serial_log = serial_log_path(spec)
-    if serial_log.exists():
-        serial_log.unlink()
+    serial_log_path(spec).unlink(missing_ok=True)
+
+
+def _nic_argv(nics: list[dict]) -> Iterator[str]:
+    """Yield -netdev/-device tokens for each NIC in spec order."""
+    for nic_idx, nic in enumerate(nics):
+        nic_model = nic.get("model", nic.get("nic_model", "virtio-net-pci"))
+        tap = nic["tap"]
+        mac = nic["mac"]
+        num_queues = int(nic.get("queues", nic.get("nic_queues", 1)))
+        use_vhost = bool(nic.get("vhost", False))
+        netdev = f"tap,id=net{nic_idx},ifname={tap},script=no,downscript=no"
+        netdev += ",vhost=on" if use_vhost else ",vnet_hdr=off"
+        if num_queues > 1:
+            netdev += f",queues={num_queues}"
+
+        device = f"{nic_model},netdev=net{nic_idx},mac={mac}"
+        if nic_model.startswith("virtio-net"):
+            device += ",mrg_rxbuf=on"
+            if num_queues > 1:
+                device += f",mq=on,vectors={2 * num_queues + 2}"
+
+        yield "-netdev"
+        yield netdev
+        yield "-device"
+        yield device
+
+
+def _ivshmem_argv(devices: list[dict]) -> Iterator[str]:
+    """Yield memory-backend/ivshmem-plain tokens for each shared-memory device."""
+    for idx, dev in enumerate(devices):
+        yield "-object"
+        yield f"memory-backend-file,size={dev['size']},share=on,mem-path={dev['path']},id=hmem{idx}"
+        yield "-device"
+        yield f"ivshmem-plain,memdev=hmem{idx}"
+
+
+def _fw_cfg_argv(spec: dict) -> Iterator[str]:
+    """Yield -fw_cfg tokens: the node hostname plus any spec overrides."""
+    fw_cfg = {"opt/wos/hostname": node_hostname(spec)}
+    for entry in spec.get("fw_cfg", []):
+        fw_cfg[entry["name"]] = entry["string"]
+    for name, value in fw_cfg.items():
+        yield "-fw_cfg"
+        yield f"name={name},string={value}"
 
 
 def build_qemu_args(
@@ -215,8 +288,7 @@ def build_qemu_args(
     ``tcg_level``: None = KVM, "" = basic TCG, "int" = TCG+interrupts,
     "full" = TCG+CPU state.
     """
-    spec = normalize_node_spec(spec)
-    vm_cfg = spec["vm"]
+    spec, vm_cfg = _spec_view(spec)
     nid = node_id(spec)
 
     memory = vm_cfg.get("memory", "4G")
@@ -228,12 +300,12 @@ def build_qemu_args(
     serial_log.parent.mkdir(parents=True, exist_ok=True)
 
     if tcg_level is not None:
-        accel_args = ["-accel", "tcg,thread=multi", "-cpu", "max"]
+        accel_args = TCG_ACCEL_ARGS
         log_flags = TCG_LOG_LEVELS.get(tcg_level, TCG_LOG_LEVELS[""])
         qemu_log = qemu_log_path(spec, tcg_level=tcg_level)
         log(f"  [VM{nid}] Using TCG (software emulation) - level: {tcg_level or 'default'}")
     else:
-        accel_args = ["-cpu", "host,migratable=no,+invtsc", "--enable-kvm"]
+        accel_args = KVM_ACCEL_ARGS
         log_flags = "cpu_reset,guest_errors"
         qemu_log = qemu_log_path(spec)
 
@@ -250,20 +322,14 @@ def build_qemu_args(
         str(cpus),
         "-drive",
         f"file={overlay0},if=none,id=drive0,format=qcow2,cache=unsafe",
-        "-device",
-        "ahci,id=ahci",
-        "-device",
-        "ide-hd,drive=drive0,bus=ahci.0",
+        *AHCI_ARGS,
         "-drive",
         f"file={overlay1},if=none,id=drive1,format=qcow2,cache=unsafe",
         "-device",
         "ide-hd,drive=drive1,bus=ahci.1",
         "-chardev",
         f"file,id=char0,path={serial_log}",
-        "-serial",
-        "chardev:char0",
-        "-display",
-        "none",
+        *SERIAL_DISPLAY_ARGS,
         "-bios",
         vm_cfg.get("bios", DEFAULT_VM_CONFIG["bios"]),
         *(["-d", log_flags] if log_flags else []),
@@ -271,71 +337,35 @@ def build_qemu_args(
         str(qemu_log),
     ]
 
-    for nic_idx, nic in enumerate(spec.get("nics", [])):
-        nic_model = nic.get("model", nic.get("nic_model", "virtio-net-pci"))
-        tap = nic["tap"]
-        mac = nic["mac"]
-        num_queues = int(nic.get("queues", nic.get("nic_queues", 1)))
-        use_vhost = bool(nic.get("vhost", False))
-        netdev_options = [
-            f"tap,id=net{nic_idx}",
-            f"ifname={tap}",
-            "script=no",
-            "downscript=no",
-        ]
-        if use_vhost:
-            netdev_options.append("vhost=on")
-        else:
-            netdev_options.append("vnet_hdr=off")
-        if num_queues > 1:
-            netdev_options.append(f"queues={num_queues}")
-
-        device_options = [f"{nic_model},netdev=net{nic_idx}", f"mac={mac}"]
-        if nic_model.startswith("virtio-net"):
-            device_options.append("mrg_rxbuf=on")
-            if num_queues > 1:
-                device_options.extend(["mq=on", f"vectors={2 * num_queues + 2}"])
-
-        args.extend(["-netdev", ",".join(netdev_options), "-device", ",".join(device_options)])
-
-    for idx, dev in enumerate(spec.get("ivshmem", [])):
-        args.extend(
-            [
-                "-object",
-                f"memory-backend-file,size={dev['size']},share=on,mem-path={dev['path']},id=hmem{idx}",
-                "-device",
-                f"ivshmem-plain,memdev=hmem{idx}",
-            ]
-        )
-
-    fw_cfg = {"opt/wos/hostname": node_hostname(spec)}
-    for entry in spec.get("fw_cfg", []):
-        fw_cfg[entry["name"]] = entry["string"]
-    for name, value in fw_cfg.items():
-        args.extend(["-fw_cfg", f"name={name},string={value}"])
+    args.extend(_nic_argv(spec.get("nics", [])))
+    args.extend(_ivshmem_argv(spec.get("ivshmem", [])))
+    args.extend(_fw_cfg_argv(spec))
 
     if node_debug_enabled(spec, force_debug=force_debug):
         gdb_port = int(vm_cfg.get("gdb_port", 1234 + nid))
         debugcon_port = int(vm_cfg.get("debugcon_port", 23456 + nid))
         monitor_port = int(vm_cfg.get("monitor_port", 3002 + nid))
 
-        args.extend(["-gdb", f"tcp:127.0.0.1:{gdb_port}", "-S"])
         args.extend(
-            [
+            (
+                "-gdb",
+                f"tcp:127.0.0.1:{gdb_port}",
+                "-S",
                 "-chardev",
                 f"socket,id=debugger,port={debugcon_port},host=0.0.0.0,server=on,wait=off,telnet=on",
                 "-device",
                 "isa-debugcon,iobase=0x402,chardev=debugger",
-            ]
+                "-monitor",
+                f"tcp:0.0.0.0:{monitor_port},server,nowait",
+            )
         )
-        args.extend(["-monitor", f"tcp:0.0.0.0:{monitor_port},server,nowait"])
         log(f"  [VM{nid}] DEBUG: gdb=127.0.0.1:{gdb_port} debugcon={debugcon_port} monitor={monitor_port}")
 
     return args
 
 
 def netdevs_content(spec: dict, generated_by: str = "node_setup.py") -> str:
-    spec = normalize_node_spec(spec)
+    spec, _ = _spec_view(spec)
     lines = [
         f"# /etc/netdevs - generated by {generated_by}",
         "# Format: <ifname> <driver>",
@@ -349,52 +379,80 @@ def netdevs_content(spec: dict, generated_by: str = "node_setup.py") -> str:
     return "\n".join(lines) + "\n"
 
 
-def inject_into_overlay(
-    overlay_path: str | Path,
-    dropbear_key_path: str | Path | None = None,
-    hostname: str | None = None,
-    netdevs: str | None = None,
-    log=print,
-) -> bool:
-    """Inject per-node files directly into a mountfs overlay's XFS rootfs."""
-    abs_overlay = Path(overlay_path).resolve()
-    if not abs_overlay.exists():
-        log(f"  WARNING: {abs_overlay} not found, skipping overlay injection")
-        return False
+def guestfish_string(text: str) -> str:
+    """Quote text as a guestfish double-quoted argument with C escapes."""
+    out = ['"']
+    for ch in text:
+        if ch in '"\\':
+            out.append("\\" + ch)
+        elif ch == "\n":
+            out.append("\\n")
+        elif ch == "\t":
+            out.append("\\t")
+        elif ch < " " or ch == "\x7f":
+            out.append(f"\\x{ord(ch):02x}")
+        else:
+            out.append(ch)
+    out.append('"')
+    return "".join(out)
+
+
+def guestfish_device(index: int) -> str:
+    """Return guestfish's name for the index-th ``-a`` drive (/dev/sda, ...)."""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("a") + rem) + letters
+    return f"/dev/sd{letters}"
 
-    gf_cmds = "run\nmount /dev/sda1 /\n"
-    temp_files: list[str] = []
 
-    if dropbear_key_path and Path(dropbear_key_path).exists():
-        abs_key = Path(dropbear_key_path).resolve()
-        gf_cmds += "mkdir-p /etc/dropbear\n"
-        gf_cmds += f"upload {abs_key} /etc/dropbear/dropbear_rsa_host_key\n"
-        gf_cmds += "chmod 0600 /etc/dropbear/dropbear_rsa_host_key\n"
+def inject_into_overlays(jobs: list[dict], log=print) -> bool:
+    """Inject per-node files into several mountfs overlays in one guestfish run.
 
-    if hostname:
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".hostname", delete=False) as hf:
-            hf.write(hostname)
-            temp_files.append(hf.name)
-        gf_cmds += f"upload {hf.name} /etc/hostname\n"
+    Each job has ``overlay`` and optional ``dropbear_key_path``, ``hostname``
+    and ``netdevs`` keys.  All overlays are attached to one appliance, so the
+    libguestfs kernel boots once instead of once per node.  Small text files
+    are written inline with guestfish ``write``.
+    """
+    drives: list[str] = []
+    gf_cmds = "run\n"
+    for index, job in enumerate(jobs):
+        abs_overlay = Path(job["overlay"]).resolve()
+        if not abs_overlay.exists():
+            log(f"  WARNING: {abs_overlay} not found, skipping overlay injection")
+            return False
+
+        gf_cmds += f"mount {guestfish_device(index)}1 /\n"
+        drives += ["-a", str(abs_overlay)]
+
+        dropbear_key_path = job.get("dropbear_key_path")
+        if dropbear_key_path and Path(dropbear_key_path).exists():
+            abs_key = Path(dropbear_key_path).resolve()
+            gf_cmds += "mkdir-p /etc/dropbear\n"
+            gf_cmds += f"upload {abs_key} /etc/dropbear/dropbear_rsa_host_key\n"
+            gf_cmds += "chmod 0600 /etc/dropbear/dropbear_rsa_host_key\n"
 
-    if netdevs is not None:
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".netdevs", delete=False) as nf:
-            nf.write(netdevs)
-            temp_files.append(nf.name)
-        gf_cmds += f"upload {nf.name} /etc/netdevs\n"
+        hostname = job.get("hostname")
+        if hostname:
+            gf_cmds += f"write /etc/hostname {guestfish_string(hostname)}\n"
 
-    gf_cmds += "umount /\n"
+        netdevs = job.get("netdevs")
+        if netdevs is not None:
+            gf_cmds += f"write /etc/netdevs {guestfish_string(netdevs)}\n"
+
+        gf_cmds += "umount /\n"
+
+    if not drives:
+        return True
 
     result = subprocess.run(
-        ["guestfish", "--rw", "-a", str(abs_overlay)],
+        ["guestfish", "--rw", *drives],
         input=gf_cmds,
         capture_output=True,
         text=True,
     )
 
-    for temp_file in temp_files:
-        os.unlink(temp_file)
-
     if result.returncode != 0:
         log(f"  WARNING: guestfish failed: {result.stderr}")
         return False
@@ -402,6 +460,27 @@ def inject_into_overlay(
     return True
 
 
+def inject_into_overlay(
+    overlay_path: str | Path,
+    dropbear_key_path: str | Path | None = None,
+    hostname: str | None = None,
+    netdevs: str | None = None,
+    log=print,
+) -> bool:
+    """Inject per-node files directly into a mountfs overlay's XFS rootfs."""
+    return inject_into_overlays(
+        [
+            {
+                "overlay": overlay_path,
+                "dropbear_key_path": dropbear_key_path,
+                "hostname": hostname,
+                "netdevs": netdevs,
+            }
+        ],
+        log=log,
+    )
+
+
 def inject_node_overlay(
     spec: dict,
     dropbear_key_path: str | Path | None = None,
@@ -412,7 +491,7 @@ def inject_node_overlay(
     return inject_into_overlay(
         mountfs_overlay,
         dropbear_key_path=dropbear_key_path,
-        hostname=node_hostname(normalize_node_spec(spec)),
+        hostname=node_hostname(_spec_view(spec)[0]),
         netdevs=netdevs_content(spec, generated_by=generated_by),
         log=log,
     )
@@ -421,7 +500,7 @@ def inject_node_overlay(
 def cluster_config_from_node_spec(spec: dict) -> dict:
     """Build a one-node cluster topology config from a normalized node spec."""
     spec = normalize_node_spec(spec)
-    vm_cfg = deepcopy(spec["vm"])
+    vm_cfg = copy_json(spec["vm"])
     zones = [
         {
             "id": "GLOBAL",
@@ -452,14 +531,14 @@ def cluster_config_from_node_spec(spec: dict) -> dict:
             "nic_queues": int(nic.get("queues", nic.get("nic_queues", 1))),
             "vhost": bool(nic.get("vhost", False)),
             "netdev_driver": nic.get("driver", nic.get("netdev_driver", "unmanaged")),
-            "bridge": deepcopy(nic.get("bridge", {})),
-            "ivshmem": deepcopy(nic.get("ivshmem", {"enabled": False})),
+            "bridge": copy_json(nic.get("bridge", {})),
+            "ivshmem": copy_json(nic.get("ivshmem", {"enabled": False})),
             "nodes_config": [
                 {
                     "id": node_id(spec),
                     "hostname": node_hostname(spec),
                     "debug": bool(spec.get("debug", False)),
-                    "vm": deepcopy(vm_cfg),
+                    "vm": copy_json(vm_cfg),
                 }
             ],
         }
@@ -312,7 +312,6 @@ def main() -> int:
     cluster_config = node_setup.cluster_config_from_node_spec(spec)
 
     if args.teardown:
-        cluster_setup.ensure_sudo()
         cluster_setup.teardown(cluster_config)
         return 0
 
@@ -328,12 +327,9 @@ def main() -> int:
         package_disks(spec, build_dir, roots, kernel_cmdline)
 
     if args.no_launch:
-        cluster_setup.ensure_sudo()
         cluster_setup.setup(cluster_config)
         return 0
 
-    if not args.no_setup:
-        cluster_setup.ensure_sudo()
     debug_nodes = {node_setup.node_id(spec)} if args.debug_node else None
     cluster_setup.launch(
         cluster_config,
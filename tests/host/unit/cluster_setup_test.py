@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 
+import contextlib
 import importlib.util
+import io
 import subprocess
 import sys
 import tempfile
 import threading
+import time
 from pathlib import Path
 
 
@@ -85,6 +88,271 @@ def test_topology_probe_is_timeout_bounded(module) -> None:
     assert_equal(result.returncode, 124, "topology probe timeout return code")
 
 
+def test_command_batcher_runs_one_sudo_shell(module) -> None:
+    calls: list[tuple[list[str], str]] = []
+    old_run = module.subprocess.run
+
+    def fake_run(args, **kwargs):
+        calls.append((args, kwargs.get("input")))
+        return subprocess.CompletedProcess(args, 0, "", "")
+
+    old_geteuid = module.os.geteuid
+    module.subprocess.run = fake_run
+    module.os.geteuid = lambda: 1000
+    try:
+        batch = module.CommandBatcher()
+        batch.add("ip link add wos-lan-br type bridge", quiet=True)
+        batch.add("ip link set wos-lan-N0 down", check=False, quiet=True)
+        batch.add("ip tuntap del dev wos-lan-N0 mode tap", fatal=True, quiet=True)
+        assert_equal(batch.flush(), True, "batch flush result")
+        assert_equal(batch.flush(), True, "empty batch flush result")
+        module.os.geteuid = lambda: 0
+        batch.add("ip link set wos-lan-br up", quiet=True)
+        assert_equal(batch.flush(), True, "root batch flush result")
+    finally:
+        module.subprocess.run = old_run
+        module.os.geteuid = old_geteuid
+
+    assert_equal(len(calls), 2, "privileged batch subprocess count")
+    assert_equal(calls[1][0], ["sh", "-s"], "root batch skips sudo")
+    args, script = calls[0]
+    assert_equal(args, ["sudo", "sh", "-s"], "privileged batch argv")
+    lines = script.splitlines()
+    assert_equal(len(lines), 3, "privileged batch line count")
+    if not lines[0].startswith("ip link add wos-lan-br type bridge || printf"):
+        raise AssertionError(f"checked line does not report failure: {lines[0]!r}")
+    assert_equal(lines[1], "{ ip link set wos-lan-N0 down; } >/dev/null 2>&1 || true", "unchecked line")
+    if not lines[2].endswith("exit 1; }"):
+        raise AssertionError(f"fatal line does not abort the batch: {lines[2]!r}")
+
+
+def test_bridge_dns_runs_every_resolvectl_command(module) -> None:
+    scripts: list[str] = []
+    logs: list[str] = []
+    old_run = module.subprocess.run
+    old_which = module.shutil.which
+
+    def fake_run(args, **kwargs):
+        scripts.append(kwargs.get("input"))
+        failed = "    FAILED: resolvectl dns wos-lan-br 10.10.0.1\n"
+        return subprocess.CompletedProcess(args, 0, "", failed)
+
+    module.subprocess.run = fake_run
+    module.shutil.which = lambda name: f"/usr/bin/{name}"
+    try:
+        module.configure_bridge_dns("wos-lan-br", ["10.10.0.1"], log=logs.append)
+    finally:
+        module.subprocess.run = old_run
+        module.shutil.which = old_which
+
+    assert_equal(len(scripts), 1, "bridge DNS privileged batch count")
+    lines = scripts[0].splitlines()
+    assert_equal(len(lines), 3, "bridge DNS command count")
+    if any("exit 1" in line for line in lines):
+        raise AssertionError(f"a failed resolvectl command skips the rest: {lines!r}")
+    assert_equal(logs[-1], "  WARNING: failed to configure bridge DNS for wos-lan-br", "failure is reported")
+
+
+def test_setup_zone_rejects_tap_that_survives_delete(module) -> None:
+    zone = {"id": 1, "name": "wki", "nodes": 1}
+    bridge = module.bridge_name(zone)
+    tap = module.tap_name(zone, 0)
+    scripts: list[str] = []
+    old_run = module.subprocess.run
+    old_owner = module.tap_owner_uid
+
+    def fake_run(args, **kwargs):
+        scripts.append(kwargs.get("input"))
+        return subprocess.CompletedProcess(args, 1, "", f"    FAILED: test ! -e /sys/class/net/{tap}\n")
+
+    module.subprocess.run = fake_run
+    module.tap_owner_uid = lambda _tap: 0
+    try:
+        module._setup_zone(zone, {}, {bridge, tap}, {}, "wos", 1000)
+    except module.ZoneSetupError as exc:
+        assert_equal(str(exc.cause), f"stale TAP {tap} still exists after delete", "stale TAP error")
+    else:
+        raise AssertionError("a TAP that survived its delete was re-attached")
+    finally:
+        module.subprocess.run = old_run
+        module.tap_owner_uid = old_owner
+
+    lines = scripts[0].splitlines()
+    deleted = next(i for i, line in enumerate(lines) if line.startswith(f"ip tuntap del dev {tap}"))
+    if not (lines[deleted + 1].startswith(f"test ! -e /sys/class/net/{tap} ||") and "exit 1" in lines[deleted + 1]):
+        raise AssertionError(f"no fatal existence check after the TAP delete: {lines!r}")
+
+
+def test_ivshmem_file_is_sparse_and_world_writable(module) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "wos-wki-0-1"
+        path.write_bytes(b"stale contents")
+        module.create_ivshmem_file(str(path), 16 * 1024 * 1024)
+        st = path.stat()
+        assert_equal(st.st_size, 16 * 1024 * 1024, "ivshmem file size")
+        assert_equal(st.st_mode & 0o777, 0o666, "ivshmem file mode")
+        assert_equal(path.read_bytes()[:14], bytes(14), "ivshmem file is truncated")
+        if st.st_blocks * 512 >= st.st_size:
+            raise AssertionError("ivshmem file was written out instead of sparse-allocated")
+
+
+def test_link_inventory_uses_one_probe(module) -> None:
+    calls: list[list[str]] = []
+    old_run = module.subprocess.run
+
+    def fake_run(args, **kwargs):
+        calls.append(args)
+        stdout = '[{"ifindex": 1, "ifname": "lo"}, {"ifindex": 7, "ifname": "wos-lan-br"}]'
+        return subprocess.CompletedProcess(args, 0, stdout, "")
+
+    module.subprocess.run = fake_run
+    try:
+        links = module.link_inventory()
+    finally:
+        module.subprocess.run = old_run
+
+    assert_equal(calls, [["ip", "-j", "link", "show"]], "link inventory probe")
+    assert_equal(links, {"lo", "wos-lan-br"}, "link inventory names")
+
+
+def test_setup_prints_parallel_zone_logs_in_config_order(module) -> None:
+    old_setup_zone = module._setup_zone
+    old_batcher = module.CommandBatcher
+    old_link_inventory = module.link_inventory
+    old_libvirt_ifaces = module.libvirt_bridge_ifaces
+    old_host_keys = module.ensure_ssh_host_keys
+    old_vhost_check = module.ensure_vhost_net_available
+    old_ensure_sudo = module.ensure_sudo
+
+    class NullBatcher:
+        def __init__(self, log=print):
+            self.commands = []
+
+        def add(self, cmd, **_kwargs):
+            self.commands.append(cmd)
+
+        def flush(self):
+            return True
+
+    def fake_setup_zone(zone_cfg, _global_cfg, _links, _libvirt_ifaces, _user, _uid):
+        if zone_cfg["name"] == "lan":
+            time.sleep(0.05)
+        return [f"zone {zone_cfg['name']}"]
+
+    module._setup_zone = fake_setup_zone
+    module.CommandBatcher = NullBatcher
+    module.link_inventory = lambda: set()
+    module.libvirt_bridge_ifaces = lambda: {}
+    module.ensure_ssh_host_keys = lambda _node_ids: None
+    module.ensure_vhost_net_available = lambda: None
+    module.ensure_sudo = lambda: None
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            module.setup(sample_config())
+    finally:
+        module._setup_zone = old_setup_zone
+        module.CommandBatcher = old_batcher
+        module.link_inventory = old_link_inventory
+        module.libvirt_bridge_ifaces = old_libvirt_ifaces
+        module.ensure_ssh_host_keys = old_host_keys
+        module.ensure_vhost_net_available = old_vhost_check
+        module.ensure_sudo = old_ensure_sudo
+
+    text = out.getvalue()
+    if not 0 <= text.index("zone lan") < text.index("zone wki"):
+        raise AssertionError(f"zone logs printed out of config order: {text!r}")
+
+
+# Printed by the fake privileged batch, to order teardown output around it.
+BATCH_RAN = "<privileged batch ran>"
+
+
+def run_teardown(module, zone: dict, returncode: int) -> tuple[list[str], str]:
+    """Tear down *zone* with its bridge and first TAP present; return scripts and stdout."""
+    scripts: list[str] = []
+    old_run = module.subprocess.run
+    old_link_inventory = module.link_inventory
+    old_which = module.shutil.which
+    old_geteuid = module.os.geteuid
+
+    def fake_run(args, **kwargs):
+        scripts.append(kwargs.get("input"))
+        print(BATCH_RAN)
+        return subprocess.CompletedProcess(args, returncode, "", "")
+
+    module.subprocess.run = fake_run
+    module.link_inventory = lambda: {module.bridge_name(zone), module.tap_name(zone, 0)}
+    module.shutil.which = lambda name: f"/usr/bin/{name}"
+    module.os.geteuid = lambda: 1000
+    out = io.StringIO()
+    try:
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(out):
+            overlay_dir = str(Path(tmp) / "overlays")
+            global_zone = {"id": "GLOBAL", "vm": {"overlay_dir": overlay_dir}}
+            with contextlib.redirect_stderr(io.StringIO()):
+                module.teardown({"zones": [global_zone, zone]})
+    except SystemExit:
+        pass
+    finally:
+        module.subprocess.run = old_run
+        module.link_inventory = old_link_inventory
+        module.shutil.which = old_which
+        module.os.geteuid = old_geteuid
+    return scripts, out.getvalue()
+
+
+def test_teardown_deletes_present_zone_bridge(module) -> None:
+    zone = sample_config()["zones"][1]
+    bridge = module.bridge_name(zone)
+    tap = module.tap_name(zone, 0)
+    scripts, out = run_teardown(module, zone, 0)
+
+    assert_equal(len(scripts), 1, "teardown privileged batch count")
+    for cmd in (
+        f"resolvectl revert {bridge}",
+        f"ip link delete {bridge} type bridge",
+        f"ip tuntap del dev {tap} mode tap",
+    ):
+        if cmd not in scripts[0]:
+            raise AssertionError(f"teardown batch is missing {cmd!r}: {scripts[0]!r}")
+    if f"Deleted bridge: {bridge}" not in out:
+        raise AssertionError(f"bridge deletion was not reported: {out!r}")
+    if out.index(BATCH_RAN) > out.index("Deleted"):
+        raise AssertionError(f"deletions reported before the batch ran: {out!r}")
+
+
+def test_teardown_reports_no_deletions_when_batch_fails(module) -> None:
+    scripts, out = run_teardown(module, sample_config()["zones"][1], 1)
+    assert_equal(len(scripts), 1, "teardown privileged batch count")
+    if "Deleted" in out:
+        raise AssertionError(f"failed teardown reported deletions: {out!r}")
+
+
+def test_libvirt_domain_xml_maps_bridged_taps(module) -> None:
+    xml_desc = """
+    <domain type='kvm'>
+      <name>router</name>
+      <devices>
+        <interface type='bridge'>
+          <source bridge='wos-lan-br'/>
+          <target dev='vnet3'/>
+        </interface>
+        <interface type='network'>
+          <source network='default'/>
+          <target dev='vnet4'/>
+        </interface>
+      </devices>
+    </domain>
+    """
+    assert_equal(
+        module._domain_bridge_ifaces("router", xml_desc),
+        [("router", "wos-lan-br", "vnet3")],
+        "bridged libvirt interfaces",
+    )
+    assert_equal(module._domain_bridge_ifaces("broken", "<domain"), [], "malformed domain XML")
+
+
 def test_no_setup_topology_accepts_configured_links(module) -> None:
     links = {
         "wos-lan-br": up_link(),
@@ -293,6 +561,118 @@ def test_fixed_resource_benchmark_topologies(module) -> None:
         assert_equal(sum(memory for _cpus, memory in actual_layout), 32768, f"{path.name} aggregate memory MiB")
 
 
+def test_overlay_injection_shares_one_guestfish_session(module) -> None:
+    node_setup = module.node_setup
+    calls: list[tuple[list[str], str]] = []
+    old_run = node_setup.subprocess.run
+
+    def fake_run(args, **kwargs):
+        calls.append((args, kwargs["input"]))
+        return subprocess.CompletedProcess(args, 0, "", "")
+
+    node_setup.subprocess.run = fake_run
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            overlays = [Path(tmp) / f"mountfs-vm{i}.qcow2" for i in range(2)]
+            for overlay in overlays:
+                overlay.touch()
+            prepared = [
+                module.PreparedLaunch(
+                    node_id=i,
+                    args=[],
+                    lines=[],
+                    hostname=f"wos-{i}",
+                    injection={
+                        "overlay": str(overlays[i]),
+                        "hostname": f"wos-{i}",
+                        "netdevs": 'eth0 wki\n# "quoted"\\\n',
+                    },
+                )
+                for i in range(2)
+            ]
+            module.inject_prepared_overlays(prepared)
+    finally:
+        node_setup.subprocess.run = old_run
+
+    assert_equal(len(calls), 1, "guestfish invocations")
+    args, script = calls[0]
+    assert_equal(args.count("-a"), 2, "guestfish drives")
+    for expected in (
+        "mount /dev/sda1 /\n",
+        "mount /dev/sdb1 /\n",
+        'write /etc/hostname "wos-1"\n',
+        'write /etc/netdevs "eth0 wki\\n# \\"quoted\\"\\\\\\n"\n',
+    ):
+        if expected not in script:
+            raise AssertionError(f"missing {expected!r} in guestfish script {script!r}")
+    if "upload" in script:
+        raise AssertionError(f"text files should not be uploaded: {script!r}")
+    for p in prepared:
+        if not any("Injected per-node overlay" in line for line in p.lines):
+            raise AssertionError(f"VM{p.node_id} injection not reported: {p.lines!r}")
+
+
+def test_overlay_injection_retry_keeps_shared_session_error(module) -> None:
+    node_setup = module.node_setup
+    old_inject = node_setup.inject_into_overlays
+
+    def fake_inject(injections, log=print):
+        if len(injections) > 1:
+            log("    WARNING: guestfish failed: synthetic shared failure")
+            return False
+        return True
+
+    node_setup.inject_into_overlays = fake_inject
+    try:
+        prepared = [
+            module.PreparedLaunch(
+                node_id=i,
+                args=[],
+                lines=[],
+                hostname=f"wos-{i}",
+                injection={"overlay": f"mountfs-vm{i}.qcow2", "hostname": f"wos-{i}"},
+            )
+            for i in range(2)
+        ]
+        module.inject_prepared_overlays(prepared)
+    finally:
+        node_setup.inject_into_overlays = old_inject
+
+    for p in prepared:
+        assert_equal(
+            p.lines,
+            [
+                "    WARNING: guestfish failed: synthetic shared failure",
+                f"    Injected per-node overlay (hostname=wos-{p.node_id})",
+            ],
+            f"VM{p.node_id} injection log",
+        )
+
+
+def test_node_log_cleanup_removes_only_this_nodes_logs(module) -> None:
+    node_setup = module.node_setup
+    with tempfile.TemporaryDirectory() as tmp:
+        log_dir = Path(tmp)
+        stale = ["qemu-vm3.log", "qemu-vm3.1.log", "qemu-vm3.oldlog", "qemu-vm3-cpu0.log"]
+        kept = ["qemu-vm31.log", "qemu-vm4.log", "qemu-vm3-cpu0.txt", "notes.txt"]
+        for name in stale + kept:
+            (log_dir / name).write_text("x")
+        serial_log = log_dir / "serial-vm3.log"
+        serial_log.write_text("x")
+
+        node_setup.cleanup_node_logs(
+            {
+                "id": 3,
+                "vm": {
+                    "qemu_log": str(log_dir / "qemu-vm3.log"),
+                    "serial_log": str(serial_log),
+                },
+            }
+        )
+
+        assert_equal(sorted(p.name for p in log_dir.iterdir()), sorted(kept), "remaining logs")
+
+
 def test_node_overlay_creation_failure_aborts_launch_prep(module) -> None:
     node_setup = module.node_setup
     lines: list[str] = []
@@ -332,9 +712,12 @@ def test_node_overlay_creation_failure_aborts_launch_prep(module) -> None:
         raise AssertionError(f"overlay creation failure was not logged: {lines!r}")
 
 
-def test_launch_one_vm_wraps_overlay_creation_failure_without_popen(module) -> None:
+def test_launch_aborts_on_overlay_creation_failure_without_popen(module) -> None:
     old_build_qemu_args = module.build_qemu_args
     old_popen = module.subprocess.Popen
+    old_validate = module.validate_no_setup_topology
+    old_collect = module.collect_unique_nodes
+    old_handlers = {sig: module.signal.getsignal(sig) for sig in (module.signal.SIGINT, module.signal.SIGTERM)}
     popen_called = False
 
     def fake_build_qemu_args(*_args, **_kwargs):
@@ -347,42 +730,53 @@ def test_launch_one_vm_wraps_overlay_creation_failure_without_popen(module) -> N
 
     module.build_qemu_args = fake_build_qemu_args
     module.subprocess.Popen = fake_popen
+    module.validate_no_setup_topology = lambda _config: None
+    module.collect_unique_nodes = lambda _config: {7: {"effective": {}, "zones": []}}
+    err = io.StringIO()
     try:
-        try:
-            module.launch_one_vm(
-                7,
-                {"effective": {}, "zones": []},
-                {"zones": [{"id": "GLOBAL"}]},
-                None,
-                None,
-                [],
-                threading.Lock(),
-                threading.Event(),
-            )
-        except module.LaunchError as exc:
-            if not isinstance(exc.cause, module.node_setup.OverlayCreationError):
-                raise AssertionError(f"wrong launch error cause: {exc.cause!r}") from exc
-        else:
-            raise AssertionError("launch_one_vm did not wrap overlay prep failure")
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(err):
+            module.launch_guarded({"zones": [{"id": "GLOBAL"}]}, skip_setup=True)
+    except SystemExit as exc:
+        assert_equal(exc.code, 1, "launch exit code")
+    else:
+        raise AssertionError("launch continued after overlay prep failure")
     finally:
         module.build_qemu_args = old_build_qemu_args
         module.subprocess.Popen = old_popen
+        module.validate_no_setup_topology = old_validate
+        module.collect_unique_nodes = old_collect
+        for sig, handler in old_handlers.items():
+            module.signal.signal(sig, handler)
 
     assert_equal(popen_called, False, "QEMU must not launch after overlay prep failure")
+    if "ERROR: VM7 launch failed: failed to create overlay" not in err.getvalue():
+        raise AssertionError(f"overlay prep failure was not reported: {err.getvalue()!r}")
 
 
 def main() -> None:
     module = load_module()
     tests = [
         test_topology_probe_is_timeout_bounded,
+        test_command_batcher_runs_one_sudo_shell,
+        test_bridge_dns_runs_every_resolvectl_command,
+        test_setup_zone_rejects_tap_that_survives_delete,
+        test_ivshmem_file_is_sparse_and_world_writable,
+        test_link_inventory_uses_one_probe,
+        test_setup_prints_parallel_zone_logs_in_config_order,
+        test_teardown_deletes_present_zone_bridge,
+        test_teardown_reports_no_deletions_when_batch_fails,
+        test_libvirt_domain_xml_maps_bridged_taps,
         test_no_setup_topology_accepts_configured_links,
         test_no_setup_topology_rejects_missing_or_stale_links,
         test_running_wos_qemu_probe_filters_unrelated_processes,
         test_cluster_launch_guard_rejects_second_launcher,
         test_cluster_launch_guard_rejects_preexisting_wos_qemu,
         test_fixed_resource_benchmark_topologies,
+        test_overlay_injection_shares_one_guestfish_session,
+        test_overlay_injection_retry_keeps_shared_session_error,
+        test_node_log_cleanup_removes_only_this_nodes_logs,
         test_node_overlay_creation_failure_aborts_launch_prep,
-        test_launch_one_vm_wraps_overlay_creation_failure_without_popen,
+        test_launch_aborts_on_overlay_creation_failure_without_popen,
     ]
     for test in tests:
         test(module)
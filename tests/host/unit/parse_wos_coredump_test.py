@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+
+import contextlib
+import importlib.util
+import io
+import json
+import re
+import struct
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[3]
+PARSE_WOS_COREDUMP = ROOT / "tools" / "parse_wos_coredump.py"
+KERN_SRC = ROOT / "modules" / "kern" / "src" / "platform"
+COREDUMP_CPP = KERN_SRC / "dbg" / "coredump.cpp"
+GATES_HPP = KERN_SRC / "interrupt" / "gates.hpp"
+CPU_HPP = KERN_SRC / "asm" / "cpu.hpp"
+
+STT_OBJECT = 1
+STT_FUNC = 2
+
+
+def load_module():
+    spec = importlib.util.spec_from_file_location("parse_wos_coredump", PARSE_WOS_COREDUMP)
+    if spec is None or spec.loader is None:
+        raise AssertionError(f"failed to load {PARSE_WOS_COREDUMP}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def assert_equal(actual, expected, msg):
+    if actual != expected:
+        raise AssertionError(f"{msg}: expected {expected!r}, got {actual!r}")
+
+
+def build_elf(symbols: list[tuple[str, int, int, int]]) -> bytes:
+    """Build a minimal ELF64 image with .text, .symtab, .strtab and .shstrtab.
+
+    Each symbol is (name, st_type, st_value, st_size).
+    """
+    strtab = bytearray(b"\0")
+    symtab = bytearray(bytes(24))
+    for name, st_type, value, size in symbols:
+        name_off = len(strtab)
+        strtab += name.encode() + b"\0"
+        symtab += struct.pack("<IBBHQQ", name_off, 0x10 | st_type, 0, 1, value, size)
+
+    shstrtab = bytearray(b"\0")
+    section_names = {}
+    for name in (".text", ".symtab", ".strtab", ".shstrtab"):
+        section_names[name] = len(shstrtab)
+        shstrtab += name.encode() + b"\0"
+
+    symtab_off = 64
+    strtab_off = symtab_off + len(symtab)
+    shstrtab_off = strtab_off + len(strtab)
+    shoff = (shstrtab_off + len(shstrtab) + 7) & ~7
+
+    header = bytearray(64)
+    header[:5] = b"\x7fELF\x02"
+    struct.pack_into("<Q", header, 40, shoff)
+    struct.pack_into("<HHH", header, 58, 64, 5, 4)
+
+    shdr = struct.Struct("<IIQQQQIIqq")
+    sections = [
+        bytes(64),
+        shdr.pack(section_names[".text"], 1, 0x6, 0x401000, 0, 0x100, 0, 0, 16, 0),
+        shdr.pack(section_names[".symtab"], 2, 0, 0, symtab_off, len(symtab), 3, 1, 8, 24),
+        shdr.pack(section_names[".strtab"], 3, 0, 0, strtab_off, len(strtab), 0, 0, 1, 0),
+        shdr.pack(section_names[".shstrtab"], 3, 0, 0, shstrtab_off, len(shstrtab), 0, 0, 1, 0),
+    ]
+    body = bytes(header) + symtab + strtab + shstrtab
+    return body.ljust(shoff, b"\0") + b"".join(sections)
+
+
+def build_coredump(segments: list[tuple[int, bytes, bool]]) -> bytes:
+    """Build a version 1 coredump with the given (vaddr, data, present) segments."""
+    header_size = 16 + 7 * 8 + 2 * (7 * 8 + 15 * 8) + 8 * 8
+    table_size = len(segments) * 32
+    header = bytearray()
+    header += struct.pack("<QII", 0x504D55444F43534F, 1, header_size)
+    header += bytes(7 * 8 + 2 * (7 * 8 + 15 * 8))
+    header += struct.pack("<8Q", 0, 0, 0, 0, len(segments), header_size, 0, 0)
+
+    table = bytearray()
+    data_off = header_size + table_size
+    for vaddr, data, present in segments:
+        table += struct.pack("<QQQII", vaddr, len(data), data_off, 3, int(present))
+        data_off += len(data)
+    return bytes(header + table) + b"".join(data for _, data, _ in segments)
+
+
+def test_symtab_keeps_code_symbols_and_resolves_offsets(module) -> None:
+    elf = build_elf(
+        [
+            ("kmain", STT_FUNC, 0x401000, 0x10),
+            ("kernel_data", STT_OBJECT, 0x401040, 0x8),
+            ("isr_stub", 0, 0x401080, 0),
+            ("undefined_sym", STT_FUNC, 0, 0),
+        ]
+    )
+    table = module._parse_elf_symtab(elf)
+    if table is None:
+        raise AssertionError("symbol table was not parsed")
+    assert_equal(table.count, 2, "only FUNC/NOTYPE symbols with an address are kept")
+    assert_equal(table.lookup(0x401000), "kmain", "exact symbol address")
+    assert_equal(table.lookup(0x401004), "kmain+0x4", "offset inside sized symbol")
+    assert_equal(table.lookup(0x401048), "kmain+0x48", "small overrun past symbol size")
+    assert_equal(table.lookup(0x401090), "isr_stub+0x10", "unsized symbol offset")
+    assert_equal(table.lookup(0x400fff), None, "address below the first symbol")
+
+    sections = module._parse_elf_sections(elf)
+    if sections is None:
+        raise AssertionError("section map was not parsed")
+    assert_equal(sections.count, 1, "only allocated sections are mapped")
+    assert_equal(sections.lookup(0x401000), ".text", "exact section address")
+    assert_equal(sections.lookup(0x401020), ".text+0x20", "section fallback")
+    assert_equal(sections.lookup(0x401100), None, "address past the section end")
+
+
+def test_demangle_batch_only_pipes_mangled_names(module) -> None:
+    inputs: list[str] = []
+    old_run = module.subprocess.run
+
+    def fake_run(args, **kwargs):
+        inputs.append(kwargs["input"])
+        return subprocess.CompletedProcess(args, 0, "wos::kmain()\nwos::panic(char const*)\n", "")
+
+    module.subprocess.run = fake_run
+    try:
+        result = module._demangle_batch(["_ZN3wos5kmainEv", "isr_stub", "_ZN3wos5panicEPKc"])
+        unmangled = module._demangle_batch(["isr_stub", "memcpy"])
+    finally:
+        module.subprocess.run = old_run
+
+    assert_equal(inputs, ["_ZN3wos5kmainEv\n_ZN3wos5panicEPKc"], "llvm-cxxfilt input")
+    assert_equal(result, ["wos::kmain()", "isr_stub", "wos::panic(char const*)"], "demangled names")
+    assert_equal(unmangled, ["isr_stub", "memcpy"], "unmangled names skip llvm-cxxfilt")
+
+
+def test_symbols_are_demangled_on_first_lookup(module) -> None:
+    inputs: list[str] = []
+    old_run = module.subprocess.run
+
+    def fake_run(args, **kwargs):
+        inputs.append(kwargs["input"])
+        return subprocess.CompletedProcess(args, 0, "wos::kmain()\n", "")
+
+    module.subprocess.run = fake_run
+    try:
+        table = module.SymbolTable()
+        table.add(0x401000, "_ZN3wos5kmainEv", 0x10)
+        table.add(0x402000, "_ZN3wos5panicEPKc", 0x10)
+        table.finish()
+        assert_equal(inputs, [], "finish() does not demangle")
+        assert_equal(table.lookup(0x401004), "wos::kmain()+0x4", "first lookup")
+        assert_equal(table.lookup(0x401008), "wos::kmain()+0x8", "cached lookup")
+    finally:
+        module.subprocess.run = old_run
+
+    assert_equal(inputs, ["_ZN3wos5kmainEv"], "only the hit symbol is demangled, once")
+
+
+def test_read_va_bytes_stitches_adjacent_segments(module) -> None:
+    # Segments are deliberately out of address order in the table.
+    dump = module.parse_coredump(
+        build_coredump(
+            [
+                (0x2000, b"B" * 0x1000, True),
+                (0x1000, b"A" * 0x1000, True),
+                (0x3000, b"C" * 0x1000, False),
+            ]
+        )
+    )
+    assert_equal(module.read_va_bytes(dump, 0x1FFC, 8), b"AAAABBBB", "read across a segment boundary")
+    assert_equal(module.read_va_bytes(dump, 0x2FFC, 8), None, "read into a segment that is not present")
+    assert_equal(module.find_segment_for_va(dump, 0x0FFF), None, "address below every segment")
+    assert_equal(module.find_segment_for_va(dump, 0x2000).vaddr, 0x2000, "segment start address")
+
+
+def test_bad_files_are_rejected_with_a_message(module) -> None:
+    header = build_coredump([])
+    cases = [
+        (b"WOS", "Truncated coredump: 3 bytes"),
+        (b"\0" + header[1:], "Bad magic: 0x504d55444f435300 (expected 0x504d55444f43534f)"),
+        (header[:40], "Truncated coredump header: 40 bytes"),
+    ]
+    for data, expected in cases:
+        try:
+            module.parse_coredump(data)
+        except SystemExit as e:
+            assert_equal(str(e), expected, "rejection message")
+        else:
+            raise AssertionError(f"{data[:8]!r}... was accepted")
+
+
+def test_json_record_has_registers_and_segment_table(module) -> None:
+    dump = module.parse_coredump(build_coredump([(0x1000, b"A" * 0x1000, True)]))
+    record = json.loads(json.dumps(module.dump_record(dump, Path("core.bin"))))
+    assert_equal(record["file"], "core.bin", "file name")
+    assert_equal(record["magic"], 0x504D55444F43534F, "magic")
+    assert_equal(sorted(record["trapRegs"]), sorted(module.GPRegs._fields), "register names")
+    assert_equal(
+        record["segments"],
+        [
+            {
+                "vaddr": 0x1000,
+                "size": 0x1000,
+                "fileOffset": 520,
+                "type": 3,
+                "present": 1,
+                "pteFlags": 0,
+                "physAddr": 0,
+            }
+        ],
+        "segment table",
+    )
+    assert_equal("raw" in record or "symbols" in record, False, "raw bytes and symbols are left out")
+
+
+def test_no_regs_parse_keeps_the_rest_of_the_header(module) -> None:
+    data = build_coredump([(0x1000, b"A" * 0x1000, True), (0x2000, b"B" * 0x1000, False)])
+    full = module.parse_coredump(data)
+    scan = module.parse_coredump(data, regs=False)
+    assert_equal((scan.trapRegs, scan.savedRegs), (None, None), "registers are skipped")
+    assert_equal(scan.segments, full.segments, "segment table")
+    assert_equal(
+        (scan.segmentCount, scan.segmentTableOffset, scan.trapFrame, scan.savedFrame),
+        (full.segmentCount, full.segmentTableOffset, full.trapFrame, full.savedFrame),
+        "frames and task block",
+    )
+
+
+def struct_members(path: Path, name: str) -> list[tuple[str, str]]:
+    """Return the (type, name) members of a C++ struct, in declaration order."""
+    match = re.search(rf"struct {name} {{(.*?)\n}}", path.read_text(), re.S)
+    if match is None:
+        raise AssertionError(f"struct {name} not found in {path}")
+    return re.findall(r"^\s*([\w:]+) (\w+)(?:\[[^\]]*\])?;", match.group(1), re.M)
+
+
+def struct_codes(fmt: str) -> str:
+    """Expand a struct format into one code per field, e.g. '<2QI' -> 'QQI'."""
+    return "".join(code * int(count or 1) for count, code in re.findall(r"(\d*)([A-Za-z])", fmt))
+
+
+def test_layouts_match_kernel_structs(module) -> None:
+    # The C++ InterruptFrame calls rflags just "flags".
+    frame = [name for _, name in struct_members(GATES_HPP, "InterruptFrame")]
+    assert_equal(
+        [{"flags": "rflags"}.get(name, name) for name in frame],
+        list(module.InterruptFrame._fields),
+        "InterruptFrame fields",
+    )
+    regs = [name for _, name in struct_members(CPU_HPP, "GPRegs")]
+    assert_equal(regs, list(module.GPRegs._fields), "GPRegs fields")
+
+    type_codes = {
+        "uint64_t": "Q",
+        "uint32_t": "I",
+        "ker::mod::gates::InterruptFrame": "Q" * len(frame),
+        "ker::mod::cpu::GPRegs": "Q" * len(regs),
+    }
+    header = struct_members(COREDUMP_CPP, "CoreDumpHeader")
+    names = [name for _, name in header]
+    codes = [type_codes.get(ctype, "?") for ctype, _ in header]
+    v1_end = names.index("elf_offset") + 1
+    v2_end = names.index("thread_safe_stack") + 1
+    assert_equal(
+        "".join(codes[:v1_end]),
+        struct_codes(module.HEADER_PREFIX.format + module.HEADER_V1.format),
+        "v1 header layout",
+    )
+    assert_equal(
+        "".join(codes[v1_end:v2_end]), struct_codes(module.HEADER_V2.format), "v2 header layout"
+    )
+    assert_equal(
+        module.HEADER_V1_NO_REGS.size, module.HEADER_V1.size, "--no-regs header size"
+    )
+
+    segment = [type_codes[ctype] for ctype, _ in struct_members(COREDUMP_CPP, "CoreDumpSegment")]
+    assert_equal("".join(segment), struct_codes(module.SEGMENT_V2.format), "segment entry layout")
+
+
+def test_batch_mode_reports_truncated_dump_and_continues(module) -> None:
+    good = build_coredump([(0x1000, b"A" * 0x1000, True)])
+    # Cut the dump inside its single segment table entry.
+    truncated = good[: len(good) - 0x1000 - 16]
+    try:
+        module.parse_coredump(truncated)
+    except SystemExit as e:
+        assert_equal(str(e), "Truncated coredump segment table", "truncated table message")
+    else:
+        raise AssertionError("truncated segment table was accepted")
+
+    # Worker processes import the tool by module name.
+    sys.modules[module.__name__] = module
+    if str(PARSE_WOS_COREDUMP.parent) not in sys.path:
+        sys.path.insert(0, str(PARSE_WOS_COREDUMP.parent))
+    out = io.StringIO()
+    err = io.StringIO()
+    old_argv = sys.argv
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [Path(tmp) / name for name in ("a.bin", "trunc.bin", "b.bin")]
+        for path, data in zip(paths, (good, truncated, good)):
+            path.write_bytes(data)
+        sys.argv = ["parse_wos_coredump.py", *map(str, paths)]
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                rc = module.main()
+        finally:
+            sys.argv = old_argv
+
+    assert_equal(rc, 1, "batch exit code with one bad file")
+    summaries = [line for line in out.getvalue().splitlines() if line.startswith("file: ")]
+    assert_equal(
+        summaries, [f"file: {paths[0]}", f"file: {paths[2]}"], "files after the bad one are still printed"
+    )
+    assert_equal(
+        err.getvalue(), f"{paths[1]}: Truncated coredump segment table\n", "bad file error"
+    )
+
+
+def main() -> None:
+    module = load_module()
+    tests = [
+        test_symtab_keeps_code_symbols_and_resolves_offsets,
+        test_demangle_batch_only_pipes_mangled_names,
+        test_symbols_are_demangled_on_first_lookup,
+        test_read_va_bytes_stitches_adjacent_segments,
+        test_bad_files_are_rejected_with_a_message,
+        test_json_record_has_registers_and_segment_table,
+        test_no_regs_parse_keeps_the_rest_of_the_header,
+        test_layouts_match_kernel_structs,
+        test_batch_mode_reports_truncated_dump_and_continues,
+    ]
+    for test in tests:
+        test(module)
+    print(f"{len(tests)} parse_wos_coredump tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,20 @@
 
 import argparse
 import bisect
+import contextlib
+import functools
+import io
+import itertools
+import json
+import mmap
+import os
 import struct
 import subprocess
 import sys
-from dataclasses import dataclass, fields
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, NamedTuple, Optional
 
 COREDUMP_MAGIC = 0x504D55444F43534F  # "WOSCODMP" little-endian-ish
 
@@ -18,12 +26,40 @@ SEGMENT_TYPES = {
     3: "MemoryPage",
 }
 
-SEGMENT_SIZE_V1 = 8 + 8 + 8 + 4 + 4  # 32 bytes per CoreDumpSegment
-SEGMENT_SIZE_V2 = SEGMENT_SIZE_V1 + 8 + 8
+INTERRUPT_NAMES = {
+    0: "#DE Divide Error",
+    1: "#DB Debug",
+    2: "NMI",
+    3: "#BP Breakpoint",
+    4: "#OF Overflow",
+    5: "#BR Bound Range",
+    6: "#UD Invalid Opcode",
+    7: "#NM Device Not Available",
+    8: "#DF Double Fault",
+    13: "#GP General Protection",
+    14: "#PF Page Fault",
+    16: "#MF x87 FP",
+    17: "#AC Alignment Check",
+    18: "#MC Machine Check",
+    19: "#XM SIMD FP",
+}
 
+# On-disk layouts, compiled once.
+HEADER_PREFIX = struct.Struct("<QII")  # magic, version, headerSize
+# timestamp .. cr3, trap frame + regs, saved frame + regs, taskEntry .. elfOffset
+HEADER_V1 = struct.Struct("<7Q 7Q15Q 7Q15Q 8Q")
+# Same layout with both GPRegs blocks skipped as pad bytes (--no-regs).
+HEADER_V1_NO_REGS = struct.Struct("<7Q 7Q120x 7Q120x 8Q")
+HEADER_V2 = struct.Struct("<13Q")  # segmentEntrySize .. threadSafeStack
+SEGMENT_V1 = struct.Struct("<QQQII")  # vaddr, size, fileOffset, type, present
+SEGMENT_V2_TAIL = struct.Struct("<QQ")  # pteFlags, physAddr
+SEGMENT_V2 = struct.Struct("<QQQIIQQ")  # v1 entry + v2 tail
 
-@dataclass
-class InterruptFrame:
+SEGMENT_SIZE_V1 = SEGMENT_V1.size  # 32 bytes per CoreDumpSegment
+SEGMENT_SIZE_V2 = SEGMENT_SIZE_V1 + SEGMENT_V2_TAIL.size
+
+
+class InterruptFrame(NamedTuple):
     int_num: int
     err_code: int
     rip: int
@@ -33,8 +69,7 @@ class InterruptFrame:
     ss: int
 
 
-@dataclass
-class GPRegs:
+class GPRegs(NamedTuple):
     r15: int
     r14: int
     r13: int
@@ -52,7 +87,7 @@ class GPRegs:
     rax: int
 
 
-@dataclass
+@dataclass(slots=True)
 class CoreDumpSegment:
     vaddr: int
     size: int
@@ -86,9 +121,9 @@ class CoreDump:
     cr2: int
     cr3: int
     trapFrame: InterruptFrame
-    trapRegs: GPRegs
+    trapRegs: Optional[GPRegs]  # None when parsed without registers
     savedFrame: InterruptFrame
-    savedRegs: GPRegs
+    savedRegs: Optional[GPRegs]
     taskEntry: int
     taskPagemap: int
     elfHeaderAddr: int
@@ -114,7 +149,17 @@ class CoreDump:
     cwd: str
     root: str
     segments: list[CoreDumpSegment]
-    raw: bytes  # full file contents
+    raw: memoryview  # full file contents
+    # Present, non-empty segments sorted by vaddr, for find_segment_for_va().
+    presentSegments: list[CoreDumpSegment] = field(init=False, repr=False)
+    presentVaddrs: list[int] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.presentSegments = sorted(
+            (s for s in self.segments[: int(self.segmentCount)] if s.present and s.size),
+            key=lambda s: s.vaddr,
+        )
+        self.presentVaddrs = [s.vaddr for s in self.presentSegments]
 
 
 # --- ELF64 symbol table parsing ---
@@ -125,74 +170,121 @@ SHT_DYNSYM = 11
 SHF_ALLOC = 0x2
 STT_FUNC = 2
 STT_NOTYPE = 0
+ELF64_SYM = struct.Struct("<IBBHQQ")  # Elf64_Sym, 24 bytes
+ELF64_SHDR = struct.Struct("<IIQQQQIIqq")  # Elf64_Shdr, 64 bytes
+
+
+# Itanium C++ and Rust v0 manglings; anything else comes back from
+# llvm-cxxfilt unchanged, so it is not worth piping through.
+MANGLED_PREFIXES = ("_Z", "_R")
 
 
 def _demangle_batch(names: list[str]) -> list[str]:
     """Demangle a batch of C++ symbol names via llvm-cxxfilt."""
-    if not names:
+    mangled = [i for i, name in enumerate(names) if name.startswith(MANGLED_PREFIXES)]
+    if not mangled:
         return names
     try:
         proc = subprocess.run(
             ["llvm-cxxfilt"],
-            input="\n".join(names),
+            input="\n".join(names[i] for i in mangled),
             capture_output=True,
             text=True,
             timeout=10,
         )
         if proc.returncode == 0:
             result = proc.stdout.rstrip("\n").split("\n")
-            if len(result) == len(names):
-                return result
+            if len(result) == len(mangled):
+                demangled = list(names)
+                for i, name in zip(mangled, result):
+                    demangled[i] = name
+                return demangled
     except (FileNotFoundError, subprocess.TimeoutExpired):
         pass
     return names
 
 
 class SymbolTable:
-    """Sorted symbol table for address-to-name lookups."""
+    """Sorted symbol table for address-to-name lookups.
+
+    Names are demangled lazily: only symbols that a lookup actually hits are
+    sent through llvm-cxxfilt, and each one only once.
+    """
 
     def __init__(self) -> None:
-        # Sorted by address; each entry is (addr, name, size).
-        self._syms: list[tuple[int, str, int]] = []
+        # Parallel arrays, sorted by address once finish() has run.
+        self._addrs: list[int] = []
+        self._names: list[str] = []
+        self._sizes: list[int] = []
+        # Symbol index -> demangled name.
+        self._demangled: dict[int, str] = {}
+        # Exclusive end of the plausible match range for each symbol.
+        self._ends: list[int] = []
+        # [lo, hi) bounds every plausible match; most stack qwords fall
+        # outside it and are rejected without a bisect.
+        self._lo = 0
+        self._hi = 0
 
     @property
     def count(self) -> int:
-        return len(self._syms)
+        return len(self._addrs)
 
     def add(self, addr: int, name: str, size: int) -> None:
-        self._syms.append((addr, name, size))
+        self._addrs.append(addr)
+        self._names.append(name)
+        self._sizes.append(size)
 
     def finish(self) -> None:
-        """Sort the table and demangle C++ names."""
-        demangled = _demangle_batch([name for _, name, _ in self._syms])
-        self._syms = [
-            (addr, dm, size) for (addr, _, size), dm in zip(self._syms, demangled)
+        """Sort the table by address."""
+        syms = sorted(zip(self._addrs, self._names, self._sizes))
+        self._addrs = [addr for addr, _, _ in syms]
+        self._names = [name for _, name, _ in syms]
+        self._sizes = [size for _, _, size in syms]
+        # If the symbol has a known size, only match within it - but still
+        # accept offsets up to 0x1000, as sizes can be inaccurate in
+        # hand-written asm. If size is 0 (unknown), allow up to 0x10000.
+        self._ends = [
+            addr + (max(size, 0x1001) if size > 0 else 0x10001)
+            for addr, size in zip(self._addrs, self._sizes)
         ]
-        self._syms.sort()
+        if syms:
+            self._lo = self._addrs[0]
+            self._hi = max(self._ends)
+
+    def _find(self, addr: int) -> Optional[tuple[int, int]]:
+        """Return (symbol index, offset) for `addr`, or None if implausible."""
+        if not self._lo <= addr < self._hi:
+            return None
+        idx = bisect.bisect_right(self._addrs, addr) - 1
+        if addr >= self._ends[idx]:
+            return None
+        return idx, addr - self._addrs[idx]
+
+    def demangle(self, addrs: Iterable[int]) -> None:
+        """Demangle the symbols covering `addrs` in one llvm-cxxfilt batch."""
+        pending = sorted(
+            {
+                hit[0]
+                for addr in addrs
+                if (hit := self._find(addr)) is not None
+                and hit[0] not in self._demangled
+            }
+        )
+        names = _demangle_batch([self._names[idx] for idx in pending])
+        self._demangled.update(zip(pending, names))
 
     def lookup(self, addr: int) -> Optional[str]:
         """Find the symbol containing or nearest-below `addr`.
 
         Returns a string like "func_name+0x1a" or None if no plausible match.
         """
-        if not self._syms:
-            return None
-        idx = bisect.bisect_right(self._syms, (addr,)) - 1
-        if idx < 0:
-            return None
-        sym_addr, sym_name, sym_size = self._syms[idx]
-        offset = addr - sym_addr
-        if offset < 0:
-            return None
-        # If the symbol has a known size, only match within it.
-        # If size is 0 (unknown), allow a reasonable offset (e.g. 0x10000).
-        if sym_size > 0 and offset >= sym_size:
-            # Fall through - still report if offset is small, as sizes
-            # can be inaccurate in hand-written asm.
-            if offset > 0x1000:
-                return None
-        elif sym_size == 0 and offset > 0x10000:
+        hit = self._find(addr)
+        if hit is None:
             return None
+        idx, offset = hit
+        if idx not in self._demangled:
+            self.demangle((addr,))
+        sym_name = self._demangled[idx]
         if offset == 0:
             return sym_name
         return f"{sym_name}+0x{offset:x}"
@@ -202,36 +294,86 @@ class SectionMap:
     """Maps virtual addresses to ELF section names."""
 
     def __init__(self) -> None:
-        # Sorted by address; each entry is (vaddr, size, name).
-        self._sections: list[tuple[int, int, str]] = []
+        # Parallel arrays, sorted by address once finish() has run.
+        self._addrs: list[int] = []
+        self._sizes: list[int] = []
+        self._names: list[str] = []
+        self._ends: list[int] = []
+        # [lo, hi) covers every section; anything outside is rejected early.
+        self._lo = 0
+        self._hi = 0
 
     @property
     def count(self) -> int:
-        return len(self._sections)
+        return len(self._addrs)
 
     def add(self, vaddr: int, size: int, name: str) -> None:
-        self._sections.append((vaddr, size, name))
+        self._addrs.append(vaddr)
+        self._sizes.append(size)
+        self._names.append(name)
 
     def finish(self) -> None:
-        self._sections.sort()
+        sections = sorted(zip(self._addrs, self._sizes, self._names))
+        self._addrs = [vaddr for vaddr, _, _ in sections]
+        self._sizes = [size for _, size, _ in sections]
+        self._names = [name for _, _, name in sections]
+        self._ends = [vaddr + size for vaddr, size, _ in sections]
+        if sections:
+            self._lo = self._addrs[0]
+            self._hi = max(self._ends)
 
     def lookup(self, addr: int) -> Optional[str]:
         """Find the section containing `addr`.
 
         Returns a string like ".text+0x1a" or None.
         """
-        if not self._sections:
-            return None
-        idx = bisect.bisect_right(self._sections, (addr,)) - 1
-        if idx < 0:
+        if not self._lo <= addr < self._hi:
             return None
-        sec_addr, sec_size, sec_name = self._sections[idx]
-        offset = addr - sec_addr
-        if offset < 0 or offset >= sec_size:
+        idx = bisect.bisect_right(self._addrs, addr) - 1
+        if addr >= self._ends[idx]:
             return None
+        offset = addr - self._addrs[idx]
         if offset == 0:
-            return sec_name
-        return f"{sec_name}+0x{offset:x}"
+            return self._names[idx]
+        return f"{self._names[idx]}+0x{offset:x}"
+
+
+class ElfSectionHeader(NamedTuple):
+    name: int
+    type: int
+    flags: int
+    addr: int
+    offset: int
+    size: int
+    link: int
+    info: int
+    addralign: int
+    entsize: int
+
+
+def _read_section_headers(elf: bytes) -> Optional[list[ElfSectionHeader]]:
+    """Unpack the ELF64 section header table, dropping headers past EOF.
+
+    Returns None if the image has no section header table.
+    """
+    (e_shoff,) = struct.unpack_from("<Q", elf, 40)
+    e_shentsize, e_shnum = struct.unpack_from("<HH", elf, 58)
+    if e_shoff == 0 or e_shnum == 0:
+        return None
+
+    if e_shentsize == ELF64_SHDR.size:
+        # One C-level pass over a zero-copy view of the whole table.
+        count = max(0, min(e_shnum, (len(elf) - e_shoff) // e_shentsize))
+        table = memoryview(elf)[e_shoff : e_shoff + count * e_shentsize]
+        return list(map(ElfSectionHeader._make, ELF64_SHDR.iter_unpack(table)))
+
+    headers = []
+    for i in range(e_shnum):
+        off = e_shoff + i * e_shentsize
+        if off + ELF64_SHDR.size > len(elf):
+            break
+        headers.append(ElfSectionHeader._make(ELF64_SHDR.unpack_from(elf, off)))
+    return headers
 
 
 def _parse_elf_sections(elf: bytes) -> Optional[SectionMap]:
@@ -241,25 +383,14 @@ def _parse_elf_sections(elf: bytes) -> Optional[SectionMap]:
     if elf[4] != 2:  # ELF64
         return None
 
-    (e_shoff,) = struct.unpack_from("<Q", elf, 40)
-    e_shentsize, e_shnum, e_shstrndx = struct.unpack_from("<HHH", elf, 58)
-
-    if e_shoff == 0 or e_shnum == 0 or e_shstrndx >= e_shnum:
+    (e_shstrndx,) = struct.unpack_from("<H", elf, 62)
+    shdrs = _read_section_headers(elf)
+    if shdrs is None or e_shstrndx >= len(shdrs):
         return None
 
-    def _read_shdr(i: int) -> Optional[tuple]:
-        off = e_shoff + i * e_shentsize
-        if off + 64 > len(elf):
-            return None
-        return struct.unpack_from("<IIQQQQIIqq", elf, off)
-
     # Load section name string table.
-    shstr = _read_shdr(e_shstrndx)
-    if shstr is None:
-        return None
-    shstrtab_off = shstr[4]  # sh_offset
-    shstrtab_size = shstr[5]  # sh_size
-    shstrtab = elf[shstrtab_off : shstrtab_off + shstrtab_size]
+    shstr = shdrs[e_shstrndx]
+    shstrtab = bytes(elf[shstr.offset : shstr.offset + shstr.size])
 
     def _section_name(name_off: int) -> str:
         end = shstrtab.find(b"\x00", name_off)
@@ -268,18 +399,14 @@ def _parse_elf_sections(elf: bytes) -> Optional[SectionMap]:
         return shstrtab[name_off:end].decode("utf-8", errors="replace")
 
     smap = SectionMap()
-    for i in range(e_shnum):
-        hdr = _read_shdr(i)
-        if hdr is None:
+    for hdr in shdrs:
+        if not (hdr.flags & SHF_ALLOC):
             continue
-        sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size = hdr[:6]
-        if not (sh_flags & SHF_ALLOC):
+        if hdr.addr == 0 or hdr.size == 0:
             continue
-        if sh_addr == 0 or sh_size == 0:
-            continue
-        name = _section_name(sh_name)
+        name = _section_name(hdr.name)
         if name:
-            smap.add(sh_addr, sh_size, name)
+            smap.add(hdr.addr, hdr.size, name)
 
     smap.finish()
     return smap if smap.count > 0 else None
@@ -293,76 +420,42 @@ def _parse_elf_symtab(elf: bytes) -> Optional[SymbolTable]:
     if ei_class != 2:  # Must be ELF64
         return None
 
-    (e_shoff,) = struct.unpack_from("<Q", elf, 40)
-    e_shentsize, e_shnum, e_shstrndx = struct.unpack_from("<HHH", elf, 58)
-
-    if e_shoff == 0 or e_shnum == 0:
+    (e_shnum,) = struct.unpack_from("<H", elf, 60)
+    shdrs = _read_section_headers(elf)
+    if shdrs is None or len(shdrs) < e_shnum:
         return None
 
-    # Read section headers.
-    shdrs = []
-    for i in range(e_shnum):
-        off = e_shoff + i * e_shentsize
-        if off + 64 > len(elf):
-            return None
-        (
-            sh_name,
-            sh_type,
-            sh_flags,
-            sh_addr,
-            sh_offset,
-            sh_size,
-            sh_link,
-            sh_info,
-            sh_addralign,
-            sh_entsize,
-        ) = struct.unpack_from(
-            "<IIQQQQIIqq",
-            elf,
-            off,
-        )
-        shdrs.append(
-            {
-                "name_off": sh_name,
-                "type": sh_type,
-                "offset": sh_offset,
-                "size": sh_size,
-                "link": sh_link,
-                "entsize": sh_entsize,
-            }
-        )
-
     # Find symtab (prefer .symtab over .dynsym).
     symtab_shdr = None
     for stype in (SHT_SYMTAB, SHT_DYNSYM):
-        for s in shdrs:
-            if s["type"] == stype:
-                symtab_shdr = s
-                break
+        symtab_shdr = next((s for s in shdrs if s.type == stype), None)
         if symtab_shdr is not None:
             break
     if symtab_shdr is None:
         return None
 
     # The linked section is the string table for symbol names.
-    strtab_idx = symtab_shdr["link"]
-    if strtab_idx >= len(shdrs):
+    if symtab_shdr.link >= len(shdrs):
         return None
-    strtab_shdr = shdrs[strtab_idx]
-    strtab = elf[strtab_shdr["offset"] : strtab_shdr["offset"] + strtab_shdr["size"]]
+    strtab_shdr = shdrs[symtab_shdr.link]
+    strtab = bytes(elf[strtab_shdr.offset : strtab_shdr.offset + strtab_shdr.size])
 
     # Parse symbol entries.
-    entsize = symtab_shdr["entsize"] or 24  # Elf64_Sym is 24 bytes
-    sym_off = symtab_shdr["offset"]
-    sym_end = sym_off + symtab_shdr["size"]
+    entsize = symtab_shdr.entsize or ELF64_SYM.size
+    sym_off = symtab_shdr.offset
+    sym_count = max(0, min(symtab_shdr.size, len(elf) - sym_off) // entsize)
     table = SymbolTable()
 
-    while sym_off + entsize <= sym_end:
-        st_name, st_info, st_other, st_shndx, st_value, st_size = struct.unpack_from(
-            "<IBBHQQ", elf, sym_off
+    if entsize == ELF64_SYM.size:
+        # Unpack the whole table in one C-level pass over a zero-copy view.
+        syms = memoryview(elf)[sym_off : sym_off + sym_count * entsize]
+        entries = ELF64_SYM.iter_unpack(syms)
+    else:
+        entries = (
+            ELF64_SYM.unpack_from(elf, sym_off + i * entsize) for i in range(sym_count)
         )
-        sym_off += entsize
 
+    for st_name, st_info, _st_other, _st_shndx, st_value, st_size in entries:
         stt = st_info & 0xF
         if stt not in (STT_FUNC, STT_NOTYPE):
             continue
@@ -382,13 +475,26 @@ def _parse_elf_symtab(elf: bytes) -> Optional[SymbolTable]:
     return table if table.count > 0 else None
 
 
+def map_file(path: Path) -> memoryview:
+    """Map a file read-only; pages are only faulted in as they are touched.
+
+    Falls back to reading the file when it cannot be mapped (empty files,
+    pipes).
+    """
+    with path.open("rb") as f:
+        try:
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (ValueError, OSError):
+            return memoryview(f.read())
+
+
 def _get_elf_bytes(
     path: Optional[Path] = None, dump: Optional["CoreDump"] = None
-) -> Optional[bytes]:
-    """Return raw ELF bytes from a file path or embedded in a coredump."""
+) -> Optional[memoryview]:
+    """Return a zero-copy view of ELF bytes from a file path or a coredump."""
     if path is not None:
         try:
-            return path.read_bytes()
+            return map_file(path)
         except OSError as e:
             print(f"Warning: could not read {path}: {e}", file=sys.stderr)
             return None
@@ -421,6 +527,13 @@ def load_sections_from_coredump(dump: "CoreDump") -> Optional[SectionMap]:
     return _parse_elf_sections(elf) if elf else None
 
 
+def demangle_symbols(addrs: Iterable[int], tables: list[SymbolTable]) -> None:
+    """Demangle every symbol `addrs` can resolve to with one batch per table."""
+    addrs = list(addrs)
+    for t in tables:
+        t.demangle(addrs)
+
+
 def resolve_addr(
     addr: int,
     tables: list[SymbolTable],
@@ -439,8 +552,10 @@ def resolve_addr(
     return None
 
 
+@functools.lru_cache(maxsize=8192)
 def u64(x: int) -> str:
-    return f"0x{x:016x}"
+    # Cached: stack memory repeats zeros, return addresses and frame pointers.
+    return "0x%016x" % x
 
 
 def parse_int(s: str) -> int:
@@ -451,42 +566,60 @@ def parse_int(s: str) -> int:
     return int(s)
 
 
-def parse_interrupt_frame(buf: bytes, off: int) -> tuple[InterruptFrame, int]:
-    vals = struct.unpack_from("<7Q", buf, off)
-    return InterruptFrame(*vals), off + 7 * 8
-
-
-def parse_gpregs(buf: bytes, off: int) -> tuple[GPRegs, int]:
-    vals = struct.unpack_from("<15Q", buf, off)
-    return GPRegs(*vals), off + 15 * 8
-
-
 def parse_cstr(buf: bytes, off: int, size: int) -> tuple[str, int]:
-    raw = buf[off : off + size]
+    raw = bytes(buf[off : off + size])
     end = raw.find(b"\x00")
     if end < 0:
         end = len(raw)
     return raw[:end].decode("utf-8", errors="replace"), off + size
 
 
-def parse_coredump(data: bytes) -> CoreDump:
+def _parse_segments_strided(
+    data: bytes, table_off: int, count: int, entry_size: int
+) -> list[CoreDumpSegment]:
+    """Parse segment entries with a non-standard stride, one at a time."""
+    segments = []
+    for i in range(count):
+        soff = table_off + i * entry_size
+        vaddr, size, fileOffset, stype, present = SEGMENT_V1.unpack_from(data, soff)
+        pteFlags = 0
+        physAddr = 0
+        if entry_size >= SEGMENT_SIZE_V2:
+            pteFlags, physAddr = SEGMENT_V2_TAIL.unpack_from(data, soff + SEGMENT_SIZE_V1)
+        segments.append(
+            CoreDumpSegment(vaddr, size, fileOffset, stype, present, pteFlags, physAddr)
+        )
+    return segments
+
+
+def parse_coredump(data: bytes, regs: bool = True) -> CoreDump:
+    """Parse a coredump; with regs=False the GPRegs blocks are not decoded."""
+    # Reject bad files on the 16-byte prefix before decoding anything else.
+    if len(data) < HEADER_PREFIX.size:
+        raise SystemExit(f"Truncated coredump: {len(data)} bytes")
     off = 0
-    magic, version, headerSize = struct.unpack_from("<QII", data, off)
-    off += 8 + 4 + 4
+    magic, version, headerSize = HEADER_PREFIX.unpack_from(data, off)
+    off += HEADER_PREFIX.size
 
     if magic != COREDUMP_MAGIC:
         raise SystemExit(f"Bad magic: {u64(magic)} (expected {u64(COREDUMP_MAGIC)})")
-
-    timestamp, pid, cpu, int_num, err_code, cr2, cr3 = struct.unpack_from(
-        "<7Q", data, off
-    )
-    off += 7 * 8
-
-    trapFrame, off = parse_interrupt_frame(data, off)
-    trapRegs, off = parse_gpregs(data, off)
-    savedFrame, off = parse_interrupt_frame(data, off)
-    savedRegs, off = parse_gpregs(data, off)
-
+    if len(data) < off + HEADER_V1.size:
+        raise SystemExit(f"Truncated coredump header: {len(data)} bytes")
+
+    if regs:
+        vals = HEADER_V1.unpack_from(data, off)
+        trapRegs = GPRegs._make(vals[14:29])
+        savedRegs = GPRegs._make(vals[36:51])
+        trap, saved, task = vals[7:14], vals[29:36], vals[51:59]
+    else:
+        vals = HEADER_V1_NO_REGS.unpack_from(data, off)
+        trapRegs = savedRegs = None
+        trap, saved, task = vals[7:14], vals[14:21], vals[21:29]
+    off += HEADER_V1.size
+
+    timestamp, pid, cpu, int_num, err_code, cr2, cr3 = vals[0:7]
+    trapFrame = InterruptFrame._make(trap)
+    savedFrame = InterruptFrame._make(saved)
     (
         taskEntry,
         taskPagemap,
@@ -496,8 +629,7 @@ def parse_coredump(data: bytes) -> CoreDump:
         segmentTableOffset,
         elfSize,
         elfOffset,
-    ) = struct.unpack_from("<8Q", data, off)
-    off += 8 * 8
+    ) = task
 
     segmentEntrySize = SEGMENT_SIZE_V1
     pageSize = 4096
@@ -516,7 +648,7 @@ def parse_coredump(data: bytes) -> CoreDump:
     cwd = ""
     root = ""
 
-    if version >= 2 and headerSize >= off + (13 * 8):
+    if version >= 2 and headerSize >= off + HEADER_V2.size:
         (
             segmentEntrySize,
             pageSize,
@@ -531,8 +663,8 @@ def parse_coredump(data: bytes) -> CoreDump:
             threadTlsBase,
             threadTlsSize,
             threadSafeStack,
-        ) = struct.unpack_from("<13Q", data, off)
-        off += 13 * 8
+        ) = HEADER_V2.unpack_from(data, off)
+        off += HEADER_V2.size
         if headerSize >= off + 256 * 3:
             exePath, off = parse_cstr(data, off, 256)
             cwd, off = parse_cstr(data, off, 256)
@@ -540,20 +672,20 @@ def parse_coredump(data: bytes) -> CoreDump:
 
     if segmentEntrySize < SEGMENT_SIZE_V1:
         segmentEntrySize = SEGMENT_SIZE_V1
+    if segmentTableOffset + int(segmentCount) * segmentEntrySize > len(data):
+        raise SystemExit("Truncated coredump segment table")
 
-    # Parse variable-length segment table.
-    segments = []
-    for i in range(int(segmentCount)):
-        soff = segmentTableOffset + i * segmentEntrySize
-        vaddr, size, fileOffset, stype, present = struct.unpack_from(
-            "<QQQII", data, soff
-        )
-        pteFlags = 0
-        physAddr = 0
-        if segmentEntrySize >= SEGMENT_SIZE_V2:
-            pteFlags, physAddr = struct.unpack_from("<QQ", data, soff + SEGMENT_SIZE_V1)
-        segments.append(
-            CoreDumpSegment(vaddr, size, fileOffset, stype, present, pteFlags, physAddr)
+    # Parse variable-length segment table; known entry sizes unpack in one pass.
+    entry = {SEGMENT_SIZE_V1: SEGMENT_V1, SEGMENT_SIZE_V2: SEGMENT_V2}.get(
+        segmentEntrySize
+    )
+    if entry is not None:
+        table_end = segmentTableOffset + int(segmentCount) * segmentEntrySize
+        table = memoryview(data)[segmentTableOffset:table_end]
+        segments = [CoreDumpSegment(*vals) for vals in entry.iter_unpack(table)]
+    else:
+        segments = _parse_segments_strided(
+            data, segmentTableOffset, int(segmentCount), segmentEntrySize
         )
 
     return CoreDump(
@@ -596,7 +728,7 @@ def parse_coredump(data: bytes) -> CoreDump:
         cwd=cwd,
         root=root,
         segments=segments,
-        raw=data,
+        raw=memoryview(data),
     )
 
 
@@ -614,71 +746,83 @@ def _fmt_addr(
     return base
 
 
-def print_header(
+GPREGS_TEMPLATE = (
+    "  rax={rax} rbx={rbx} rcx={rcx} rdx={rdx}\n"
+    "  rsi={rsi} rdi={rdi} rbp={rbp}\n"
+    "  r8={r8}  r9={r9}  r10={r10} r11={r11}\n"
+    "  r12={r12} r13={r13} r14={r14} r15={r15}"
+)
+
+
+def format_gpregs(regs: GPRegs) -> str:
+    return GPREGS_TEMPLATE.format_map(dict(zip(GPRegs._fields, map(u64, regs))))
+
+
+def format_header(
     dump: CoreDump,
     path: Path,
     sym_tables: Optional[list[SymbolTable]] = None,
     section_maps: Optional[list[SectionMap]] = None,
-) -> None:
+) -> list[str]:
     fa = lambda addr: _fmt_addr(addr, sym_tables, section_maps)
-    print(f"file: {path}")
-    print(
+    if sym_tables:
+        demangle_symbols(
+            (dump.cr2, dump.trapFrame.rip, dump.savedFrame.rip, dump.taskEntry),
+            sym_tables,
+        )
+    out = [f"file: {path}"]
+    out.append(
         f"magic: {u64(dump.magic)} version: {dump.version} headerSize: {dump.headerSize}"
     )
-    print(f"timestampQuantums: {dump.timestamp}")
-    print(f"pid: {dump.pid} cpu: {dump.cpu}")
-    print(
+    out.append(f"timestampQuantums: {dump.timestamp}")
+    out.append(f"pid: {dump.pid} cpu: {dump.cpu}")
+    out.append(
         f"int_num: {dump.int_num} ({interrupt_name(dump.int_num)}) err_code: {u64(dump.err_code)}"
     )
-    print(f"cr2: {fa(dump.cr2)} cr3: {u64(dump.cr3)}")
+    out.append(f"cr2: {fa(dump.cr2)} cr3: {u64(dump.cr3)}")
 
-    print("\ntrapFrame:")
+    out.append("\ntrapFrame:")
     tf = dump.trapFrame
-    print(
+    out.append(
         f"  rip={fa(tf.rip)} cs={u64(tf.cs)} rflags={u64(tf.rflags)} rsp={u64(tf.rsp)} ss={u64(tf.ss)}"
     )
-    print("trapRegs:")
-    tr = dump.trapRegs
-    print(f"  rax={u64(tr.rax)} rbx={u64(tr.rbx)} rcx={u64(tr.rcx)} rdx={u64(tr.rdx)}")
-    print(f"  rsi={u64(tr.rsi)} rdi={u64(tr.rdi)} rbp={u64(tr.rbp)}")
-    print(f"  r8={u64(tr.r8)}  r9={u64(tr.r9)}  r10={u64(tr.r10)} r11={u64(tr.r11)}")
-    print(f"  r12={u64(tr.r12)} r13={u64(tr.r13)} r14={u64(tr.r14)} r15={u64(tr.r15)}")
-
-    print("\nsavedFrame:")
+    if dump.trapRegs is not None:
+        out.append("trapRegs:")
+        out.append(format_gpregs(dump.trapRegs))
+
+    out.append("\nsavedFrame:")
     sf = dump.savedFrame
-    print(
+    out.append(
         f"  rip={fa(sf.rip)} cs={u64(sf.cs)} rflags={u64(sf.rflags)} rsp={u64(sf.rsp)} ss={u64(sf.ss)}"
     )
-    print("savedRegs:")
-    sr = dump.savedRegs
-    print(f"  rax={u64(sr.rax)} rbx={u64(sr.rbx)} rcx={u64(sr.rcx)} rdx={u64(sr.rdx)}")
-    print(f"  rsi={u64(sr.rsi)} rdi={u64(sr.rdi)} rbp={u64(sr.rbp)}")
-    print(f"  r8={u64(sr.r8)}  r9={u64(sr.r9)}  r10={u64(sr.r10)} r11={u64(sr.r11)}")
-    print(f"  r12={u64(sr.r12)} r13={u64(sr.r13)} r14={u64(sr.r14)} r15={u64(sr.r15)}")
-
-    print("\nTask:")
-    print(f"  entry={fa(dump.taskEntry)} pagemap={u64(dump.taskPagemap)}")
-    print(
+    if dump.savedRegs is not None:
+        out.append("savedRegs:")
+        out.append(format_gpregs(dump.savedRegs))
+
+    out.append("\nTask:")
+    out.append(f"  entry={fa(dump.taskEntry)} pagemap={u64(dump.taskPagemap)}")
+    out.append(
         f"  elfHeaderAddr={u64(dump.elfHeaderAddr)} programHeaderAddr={u64(dump.programHeaderAddr)}"
     )
     if dump.version >= 2:
-        print(
+        out.append(
             f"  interpBase={u64(dump.interpBase)} phnum={dump.programHeaderCount} phentsize={dump.programHeaderEntSize}"
         )
-        print(
+        out.append(
             f"  fsbase={u64(dump.threadFsBase)} gsbase={u64(dump.threadGsBase)} "
             f"stack={u64(dump.threadStackBase)}..{u64(dump.threadStackBase + dump.threadStackSize)}"
         )
-        print(
+        out.append(
             f"  tls={u64(dump.threadTlsBase)}..{u64(dump.threadTlsBase + dump.threadTlsSize)} "
             f"safestack={u64(dump.threadSafeStack)}"
         )
         if dump.exePath or dump.cwd or dump.root:
-            print(f"  exe={dump.exePath!r} cwd={dump.cwd!r} root={dump.root!r}")
+            out.append(f"  exe={dump.exePath!r} cwd={dump.cwd!r} root={dump.root!r}")
+    return out
 
 
-def print_segments(dump: CoreDump) -> None:
-    print("\nSegments:")
+def format_segments(dump: CoreDump) -> list[str]:
+    out = ["\nSegments:"]
     for i in range(int(dump.segmentCount)):
         seg = dump.segments[i]
         present_str = "present" if seg.present else "NOT present"
@@ -688,42 +832,60 @@ def print_segments(dump: CoreDump) -> None:
         )
         if dump.version >= 2:
             line += f"  phys={u64(seg.physAddr)} pte={u64(seg.pteFlags)}"
-        print(line)
+        out.append(line)
+    return out
 
 
-def print_elf(dump: CoreDump) -> None:
-    print("\nELF:")
-    print(f"  elfSize={dump.elfSize} elfOffset={dump.elfOffset}")
+def format_elf(dump: CoreDump) -> list[str]:
+    out = ["\nELF:", f"  elfSize={dump.elfSize} elfOffset={dump.elfOffset}"]
     if dump.elfSize and dump.elfOffset < len(dump.raw):
-        elf_magic = dump.raw[dump.elfOffset : dump.elfOffset + 4]
-        print(f"  elfMagic={elf_magic!r}")
+        elf_magic = bytes(dump.raw[dump.elfOffset : dump.elfOffset + 4])
+        if elf_magic == ELF_MAGIC:
+            out.append(f"  elfMagic={elf_magic!r}")
+        else:
+            out.append(f"  elfMagic={elf_magic!r} (not an ELF image)")
+    return out
+
+
+def dump_record(
+    dump: CoreDump,
+    path: Path,
+    sym_tables: Optional[list[SymbolTable]] = None,
+    section_maps: Optional[list[SectionMap]] = None,
+) -> dict:
+    """Collect the parsed header and segment table as JSON-ready values."""
+    record: dict = {"file": str(path)}
+    for f in fields(dump):
+        if not f.init or f.name == "raw":
+            continue
+        value = getattr(dump, f.name)
+        if f.name == "segments":
+            value = [asdict(seg) for seg in value[: int(dump.segmentCount)]]
+        elif isinstance(value, tuple):  # InterruptFrame / GPRegs
+            value = value._asdict()
+        record[f.name] = value
+    if sym_tables or section_maps:
+        addrs = (dump.cr2, dump.trapFrame.rip, dump.savedFrame.rip, dump.taskEntry)
+        demangle_symbols(addrs, sym_tables or [])
+        symbols = {}
+        for addr in addrs:
+            sym = resolve_addr(addr, sym_tables or [], section_maps)
+            if sym:
+                symbols[u64(addr)] = sym
+        record["symbols"] = symbols
+    return record
 
 
 def interrupt_name(num: int) -> str:
-    names = {
-        0: "#DE Divide Error",
-        1: "#DB Debug",
-        2: "NMI",
-        3: "#BP Breakpoint",
-        4: "#OF Overflow",
-        5: "#BR Bound Range",
-        6: "#UD Invalid Opcode",
-        7: "#NM Device Not Available",
-        8: "#DF Double Fault",
-        13: "#GP General Protection",
-        14: "#PF Page Fault",
-        16: "#MF x87 FP",
-        17: "#AC Alignment Check",
-        18: "#MC Machine Check",
-        19: "#XM SIMD FP",
-    }
-    return names.get(num, f"INT {num}")
+    return INTERRUPT_NAMES.get(num, f"INT {num}")
 
 
 def find_segment_for_va(dump: CoreDump, va: int) -> Optional[CoreDumpSegment]:
     """Find the segment that contains a given virtual address."""
-    for seg in dump.segments[: int(dump.segmentCount)]:
-        if seg.present and seg.vaddr <= va < seg.vaddr_end:
+    idx = bisect.bisect_right(dump.presentVaddrs, va) - 1
+    if idx >= 0:
+        seg = dump.presentSegments[idx]
+        if va < seg.vaddr_end:
             return seg
     return None
 
@@ -734,7 +896,8 @@ def read_va_bytes(dump: CoreDump, va_start: int, length: int) -> Optional[bytes]
     Returns None if the address range is not fully covered by present segments.
     For ranges spanning multiple pages, this stitches together data from multiple segments.
     """
-    result = bytearray()
+    raw = dump.raw
+    pieces = []
     va = va_start
     remaining = length
     while remaining > 0:
@@ -746,10 +909,30 @@ def read_va_bytes(dump: CoreDump, va_start: int, length: int) -> Optional[bytes]
         avail = seg.size - seg_offset
         to_read = min(avail, remaining)
         file_off = seg.fileOffset + seg_offset
-        result.extend(dump.raw[file_off : file_off + to_read])
+        pieces.append(raw[file_off : file_off + to_read])
         va += to_read
         remaining -= to_read
-    return bytes(result)
+    return b"".join(pieces)
+
+
+def stack_markers(dump: CoreDump) -> dict[int, list[str]]:
+    """Map the trap/saved RSP and RBP slots to their annotation notes."""
+    trap_rsp = dump.trapFrame.rsp
+    markers: dict[int, list[str]] = {}
+    for va, note in (
+        (trap_rsp, "<-- trap RSP"),
+        (trap_rsp - 8, "<-- trap RSP-8"),
+        (trap_rsp + 8, "<-- trap RSP+8"),
+        (dump.trapRegs.rbp, "<-- trap RBP"),
+        (dump.savedFrame.rsp, "<-- saved RSP"),
+        (dump.savedRegs.rbp, "<-- saved RBP"),
+    ):
+        markers.setdefault(va, []).append(note)
+    return markers
+
+
+def is_code_addr(value: int) -> bool:
+    return 0x400000 <= value <= 0xFFFFFF
 
 
 def annotate_qword(
@@ -758,44 +941,46 @@ def annotate_qword(
     dump: CoreDump,
     sym_tables: Optional[list[SymbolTable]] = None,
     section_maps: Optional[list[SectionMap]] = None,
+    markers: Optional[dict[int, list[str]]] = None,
+    code_syms: Optional[dict[int, Optional[str]]] = None,
 ) -> str:
-    """Generate annotation hints for a qword value at a given virtual address."""
-    notes = []
-    trap_rsp = dump.trapFrame.rsp
-    trap_rbp = dump.trapRegs.rbp
-    saved_rsp = dump.savedFrame.rsp
-    saved_rbp = dump.savedRegs.rbp
-
-    # RSP/RBP markers
-    if va == trap_rsp:
-        notes.append("<-- trap RSP")
-    if va == trap_rsp - 8:
-        notes.append("<-- trap RSP-8")
-    if va == trap_rsp + 8:
-        notes.append("<-- trap RSP+8")
-    if va == trap_rbp:
-        notes.append("<-- trap RBP")
-    if va == saved_rsp:
-        notes.append("<-- saved RSP")
-    if va == saved_rbp:
-        notes.append("<-- saved RBP")
+    """Generate annotation hints for a qword value at a given virtual address.
+
+    `markers` and `code_syms` let range dumps pass in the RSP/RBP markers
+    and pre-resolved code addresses instead of recomputing them per qword.
+    """
+    if markers is None:
+        markers = stack_markers(dump)
 
     # Value heuristics
     if value == 0:
-        notes.append("[zero]")
-    elif 0 < value < 0x1000:
-        notes.append(f"[small: {value}]")
-    elif 0x400000 <= value <= 0xFFFFFF:
-        sym = resolve_addr(value, sym_tables or [], section_maps)
-        notes.append(f"[code: {sym}]" if sym else "[code addr?]")
+        hint = "[zero]"
+    elif value < 0x1000:
+        hint = f"[small: {value}]"
+    elif is_code_addr(value):
+        if code_syms is not None and value in code_syms:
+            sym = code_syms[value]
+        else:
+            sym = resolve_addr(value, sym_tables or [], section_maps)
+        hint = f"[code: {sym}]" if sym else "[code addr?]"
     elif (value >> 40) == 0x7FFE or (value >> 40) == 0x7FFF:
-        notes.append("[stack ptr?]")
+        hint = "[stack ptr?]"
     elif value == dump.trapFrame.rip:
-        notes.append("[== trap RIP]")
+        hint = "[== trap RIP]"
     elif value == dump.savedFrame.rip:
-        notes.append("[== saved RIP]")
+        hint = "[== saved RIP]"
+    else:
+        hint = ""
 
-    return "  ".join(notes)
+    # RSP/RBP markers precede the value hint; most slots have none.
+    marker_notes = markers.get(va)
+    if marker_notes is None:
+        return hint
+    return "  ".join([*marker_notes, hint] if hint else marker_notes)
+
+
+# Printable ASCII maps to itself; everything else renders as '.'.
+HEXDUMP_ASCII = bytes(b if 32 <= b < 127 else ord(".") for b in range(256))
 
 
 def cmd_dump_range(
@@ -838,44 +1023,55 @@ def cmd_dump_range(
 
     trap_rsp = dump.trapFrame.rsp
 
+    # Decode every qword at once and resolve each distinct code address a
+    # single time; stack dumps repeat the same return addresses a lot.
+    qwords = struct.unpack_from(f"<{len(data) // 8}Q", data)
+    markers = stack_markers(dump)
+    code_values = {value for value in qwords if is_code_addr(value)}
+    demangle_symbols(code_values, sym_tables or [])
+    code_syms = {
+        value: resolve_addr(value, sym_tables or [], section_maps)
+        for value in code_values
+    }
+
     # --- Qword dump ---
     # x86-64: stack grows downward (toward lower addresses).
-    print(f"\n{'=' * 95}")
-    print(
-        f"  Memory dump: {u64(va_start_aligned)} .. {u64(va_end)}  ({length} bytes, {length // 8} qwords)"
-    )
-    print(f"  Trap RSP: {u64(trap_rsp)}  Trap RIP: {u64(dump.trapFrame.rip)}")
-    print(
-        f"  Stack grows toward lower addresses (v); callers toward higher addresses (^)"
-    )
-    print(f"{'=' * 95}")
-    print(f"     {'VIRTUAL ADDRESS':<22s}  {'VALUE (LE uint64)':<20s}  NOTES")
-    print(f"     {'-' * 20}  {'-' * 18}  {'-' * 40}")
-
-    for off in range(0, len(data) - 7, 8):
-        va = va_start_aligned + off
-        qword = struct.unpack_from("<Q", data, off)[0]
-        notes = annotate_qword(va, qword, dump, sym_tables, section_maps)
+    out = [
+        f"\n{'=' * 95}",
+        f"  Memory dump: {u64(va_start_aligned)} .. {u64(va_end)}  ({length} bytes, {length // 8} qwords)",
+        f"  Trap RSP: {u64(trap_rsp)}  Trap RIP: {u64(dump.trapFrame.rip)}",
+        f"  Stack grows toward lower addresses (v); callers toward higher addresses (^)",
+        f"{'=' * 95}",
+        f"     {'VIRTUAL ADDRESS':<22s}  {'VALUE (LE uint64)':<20s}  NOTES",
+        f"     {'-' * 20}  {'-' * 18}  {'-' * 40}",
+    ]
+
+    for i, qword in enumerate(qwords):
+        va = va_start_aligned + i * 8
+        notes = annotate_qword(
+            va, qword, dump, sym_tables, section_maps, markers, code_syms
+        )
         if va < trap_rsp:
             gutter = " v "  # below RSP - stack growth direction
         elif va == trap_rsp:
             gutter = ">>>"  # current stack pointer
         else:
             gutter = " ^ "  # above RSP - toward caller frames
-        print(f"  {gutter} {u64(va)}    {u64(qword)}  {notes}")
+        out.append(f"  {gutter} {u64(va)}    {u64(qword)}  {notes}")
 
-    print(f"{'=' * 95}")
+    out.append(f"{'=' * 95}")
 
     # --- Raw hex dump ---
-    print(f"\n  Raw hex bytes:")
+    out.append(f"\n  Raw hex bytes:")
     for off in range(0, len(data), 16):
         va = va_start_aligned + off
         chunk = data[off : off + 16]
-        hexbytes = " ".join(f"{b:02x}" for b in chunk)
-        ascii_repr = "".join(chr(b) if 32 <= b < 127 else "." for b in chunk)
-        print(f"  {u64(va)}:  {hexbytes:<48s}  |{ascii_repr}|")
+        hexbytes = chunk.hex(" ")
+        ascii_repr = chunk.translate(HEXDUMP_ASCII).decode("ascii")
+        out.append(f"  {u64(va)}:  {hexbytes:<48s}  |{ascii_repr}|")
 
-    print()
+    out.append("\n")
+    sys.stdout.write("\n".join(out))
     return 0
 
 
@@ -901,6 +1097,86 @@ def cmd_dump_segment(
     return cmd_dump_range(dump, seg.vaddr, seg.vaddr_end, sym_tables, section_maps)
 
 
+def run_one(path: Path, args: argparse.Namespace) -> int:
+    """Print the summary of one coredump and run the requested subcommand."""
+    data = map_file(path)
+    dump = parse_coredump(data, regs=not args.no_regs)
+
+    # The summary is collected and written once; errors still go to stderr.
+    out: list[str] = []
+
+    # Build symbol tables and section maps: embedded ELF first, then externals.
+    sym_tables: list[SymbolTable] = []
+    section_maps: list[SectionMap] = []
+
+    embedded_syms = load_symbols_from_coredump(dump)
+    if embedded_syms is not None:
+        out.append(f"Loaded {embedded_syms.count} symbols from embedded ELF")
+        sym_tables.append(embedded_syms)
+    embedded_secs = load_sections_from_coredump(dump)
+    if embedded_secs is not None:
+        out.append(f"Loaded {embedded_secs.count} sections from embedded ELF")
+        section_maps.append(embedded_secs)
+
+    for sym_path in args.symbols:
+        ext_syms = load_symbols_from_elf(sym_path)
+        if ext_syms is not None:
+            out.append(f"Loaded {ext_syms.count} symbols from {sym_path}")
+            sym_tables.append(ext_syms)
+        ext_secs = load_sections_from_elf(sym_path)
+        if ext_secs is not None:
+            out.append(f"Loaded {ext_secs.count} sections from {sym_path}")
+            section_maps.append(ext_secs)
+        if ext_syms is None and ext_secs is None:
+            print(
+                f"Warning: no symbols or sections found in {sym_path}", file=sys.stderr
+            )
+
+    st = sym_tables or None
+    sm = section_maps or None
+
+    if args.json:
+        sys.stdout.write(json.dumps(dump_record(dump, path, st, sm)) + "\n")
+        return 0
+
+    # Always print header info.
+    out += format_header(dump, path, st, sm)
+    out += format_segments(dump)
+    out += format_elf(dump)
+    sys.stdout.write("\n".join(out) + "\n")
+
+    # Handle subcommands.
+    if args.dump_range is not None:
+        va_start = parse_int(args.dump_range[0])
+        va_end = parse_int(args.dump_range[1])
+        return cmd_dump_range(dump, va_start, va_end, st, sm)
+
+    if args.dump_segment is not None:
+        return cmd_dump_segment(dump, args.dump_segment, st, sm)
+
+    return 0
+
+
+def _run_captured(path: Path, args: argparse.Namespace) -> tuple[int, str, str]:
+    """Run run_one() in a worker process; return its exit code and output."""
+    out = io.StringIO()
+    err = io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            rc = run_one(path, args)
+        except SystemExit as e:  # bad magic or truncated file
+            print(f"{path}: {e}", file=sys.stderr)
+            rc = 1
+        except OSError as e:
+            print(f"Error: could not read {path}: {e}", file=sys.stderr)
+            rc = 1
+        except Exception as e:
+            # Anything else malformed fails this file only, not the batch.
+            print(f"Error: could not parse {path}: {e!r}", file=sys.stderr)
+            rc = 1
+    return rc, out.getvalue(), err.getvalue()
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(
         description="Parse and analyze WOS core dump binaries.",
@@ -919,9 +1195,18 @@ examples:
   %(prog)s coredump.bin --symbols kernel.elf --symbols app.elf
       Resolve code addresses using symbols from external ELF files.
       Symbols from the embedded ELF are always loaded automatically.
+
+  %(prog)s crashes/*.bin
+      Print the summary of every dump, parsed in parallel worker processes.
 """,
     )
-    ap.add_argument("file", type=Path, help="Path to the .bin coredump file")
+    ap.add_argument(
+        "files",
+        type=Path,
+        nargs="+",
+        metavar="file",
+        help="Path to a .bin coredump file (several are parsed in parallel)",
+    )
     ap.add_argument(
         "--dump-range",
         nargs=2,
@@ -942,56 +1227,39 @@ examples:
         default=[],
         help="Load symbols from an external ELF file (can be repeated)",
     )
+    ap.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the header and segment table as one JSON object per file",
+    )
+    ap.add_argument(
+        "--no-regs",
+        action="store_true",
+        help="Skip decoding and printing the general-purpose registers (fast scan)",
+    )
     args = ap.parse_args()
-
-    data = args.file.read_bytes()
-    dump = parse_coredump(data)
-
-    # Build symbol tables and section maps: embedded ELF first, then externals.
-    sym_tables: list[SymbolTable] = []
-    section_maps: list[SectionMap] = []
-
-    embedded_syms = load_symbols_from_coredump(dump)
-    if embedded_syms is not None:
-        print(f"Loaded {embedded_syms.count} symbols from embedded ELF")
-        sym_tables.append(embedded_syms)
-    embedded_secs = load_sections_from_coredump(dump)
-    if embedded_secs is not None:
-        print(f"Loaded {embedded_secs.count} sections from embedded ELF")
-        section_maps.append(embedded_secs)
-
-    for sym_path in args.symbols:
-        ext_syms = load_symbols_from_elf(sym_path)
-        if ext_syms is not None:
-            print(f"Loaded {ext_syms.count} symbols from {sym_path}")
-            sym_tables.append(ext_syms)
-        ext_secs = load_sections_from_elf(sym_path)
-        if ext_secs is not None:
-            print(f"Loaded {ext_secs.count} sections from {sym_path}")
-            section_maps.append(ext_secs)
-        if ext_syms is None and ext_secs is None:
-            print(
-                f"Warning: no symbols or sections found in {sym_path}", file=sys.stderr
-            )
-
-    st = sym_tables or None
-    sm = section_maps or None
-
-    # Always print header info.
-    print_header(dump, args.file, st, sm)
-    print_segments(dump)
-    print_elf(dump)
-
-    # Handle subcommands.
-    if args.dump_range is not None:
-        va_start = parse_int(args.dump_range[0])
-        va_end = parse_int(args.dump_range[1])
-        return cmd_dump_range(dump, va_start, va_end, st, sm)
-
-    if args.dump_segment is not None:
-        return cmd_dump_segment(dump, args.dump_segment, st, sm)
-
-    return 0
+    if args.json and (args.dump_range is not None or args.dump_segment is not None):
+        ap.error("--json cannot be combined with --dump-range or --dump-segment")
+    if args.no_regs and (args.dump_range is not None or args.dump_segment is not None):
+        # Memory dumps annotate the saved RBP slots.
+        ap.error("--no-regs cannot be combined with --dump-range or --dump-segment")
+
+    if len(args.files) == 1:
+        return run_one(args.files[0], args)
+
+    # Several dumps: parse them in worker processes, each file's output is
+    # captured and printed whole, in argument order.
+    rc = 0
+    workers = min(len(args.files), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for code, out, err in ex.map(
+            _run_captured, args.files, itertools.repeat(args)
+        ):
+            sys.stdout.write(out)
+            sys.stdout.flush()
+            sys.stderr.write(err)
+            rc = rc or code
+    return rc
 
 
 if __name__ == "__main__":